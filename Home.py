@@ -1,4 +1,5 @@
 import streamlit as st
+from greenprint.rag import start_warm_up
 
 # --- App Config ---
 st.set_page_config(
@@ -32,6 +33,14 @@ st.markdown(
     unsafe_allow_html=True
 )
 
+# --- Chatbot Warm-up ---
+# Load the embedding model, LLM client and vector index in the background once per server process
+@st.cache_resource
+def warm_up_chatbot():
+    return start_warm_up()
+
+warm_up_chatbot()
+
 # --- Page Title ---
 st.title("Welcome to GreenPrint")
 st.subheader("Your Personal Carbon Footprint Tracker")
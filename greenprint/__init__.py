@@ -0,0 +1,6 @@
+"""GreenPrint calculation core.
+
+Streamlit-free helpers shared by the app pages. Submodules are imported
+explicitly (``from greenprint.factors import FactorMatrix``) so that importing
+the package itself stays cheap.
+"""
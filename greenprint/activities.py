@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Single registry of the activities tracked by the calculator.
+
+Pure Python on purpose: pages, batch jobs and reports import it for ids,
+display names, categories and integer positions without pulling in NumPy,
+pandas or Streamlit.
+"""
+from collections import namedtuple
+
+Activity = namedtuple("Activity", ["id", "name", "category", "index"])
+Category = namedtuple("Category", ["id", "label", "index"])
+
+# Category key -> activities, in the order the Calculator tabs show them
+CATEGORIES = {
+    "transport": ["Domestic_flight", "International_flight", "Diesel_train_local", "Diesel_train_long", "Electric_train",
+                  "Bus", "Petrol_car", "Ev_car", "Ev_scooter", "Motorcycle", "Diesel_car"],
+    "food": ["Beef", "Poultry", "Pork", "Dairy", "Fish_products", "Rice", "Sugar", "Oils_fats", "Other_food",
+             "Beverages", "Other_meat"],
+    "energy": ["Electricity", "Water"],
+    "hotel": ["Hotel_stay"],
+}
+
+# Category key -> label used in the Breakdown page and reports
+CATEGORY_LABELS = {"transport": "Travel", "food": "Food", "energy": "Energy & Water", "hotel": "Other"}
+
+DISPLAY_NAMES = {
+    "Domestic_flight": "Domestic Flights", "International_flight": "International Flights",
+    "Diesel_train_local": "Diesel Local Train", "Diesel_train_long": "Diesel Long-Dist Train",
+    "Electric_train": "Electric Train", "Bus": "Bus",
+    "Petrol_car": "Petrol Car", "Motorcycle": "Motorcycle",
+    "Ev_scooter": "E-Scooter", "Ev_car": "Electric Car",
+    "Diesel_car": "Diesel Car", "Beef": "Beef Products",
+    "Poultry": "Poultry Products", "Beverages": "Beverages", "Pork": "Pork Products",
+    "Fish_products": "Fish Products", "Other_meat": "Other Meat Products",
+    "Rice": "Rice", "Sugar": "Sugar",
+    "Oils_fats": "Veg Oils/Fats", "Dairy": "Dairy Products",
+    "Other_food": "Other Food", "Water": "Water",
+    "Electricity": "Electricity", "Hotel_stay": "Hotel Stay",
+}
+
+
+def format_activity_name(activity):
+    """Display name for an activity id (falls back to a prettified id)."""
+    return DISPLAY_NAMES.get(activity, activity.replace("_", " ").capitalize())
+
+
+CATEGORY_REGISTRY = tuple(Category(key, CATEGORY_LABELS[key], k) for k, key in enumerate(CATEGORIES))
+ACTIVITIES = [activity for activities in CATEGORIES.values() for activity in activities]
+REGISTRY = tuple(
+    Activity(activity, format_activity_name(activity), category, i)
+    for i, (category, activity) in enumerate(
+        (category, activity) for category, activities in CATEGORIES.items() for activity in activities)
+)
+BY_ID = {activity.id: activity for activity in REGISTRY}
+ACTIVITY_INDEX = {activity.id: activity.index for activity in REGISTRY}
+CATEGORY_POSITION = {category.id: category.index for category in CATEGORY_REGISTRY}
+# Integer category position of every activity, aligned with ACTIVITIES
+CATEGORY_INDEX = [CATEGORY_POSITION[activity.category] for activity in REGISTRY]
+
+
+def activities_in(category):
+    """Activity ids of one category key, in display order."""
+    return list(CATEGORIES[category])
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Vectorized category sums and top-N over activity-aligned arrays.
+
+Works on a single user's vector ``(activities,)`` or on a matrix of users
+``(users, activities)``, so the Breakdown page and bulk analytics share one
+code path.
+"""
+import numpy as np
+
+from greenprint.activities import ACTIVITIES, ACTIVITY_INDEX, CATEGORY_INDEX, CATEGORY_REGISTRY
+
+CATEGORY_CODES = np.array(CATEGORY_INDEX, dtype=np.intp)
+N_CATEGORIES = len(CATEGORY_REGISTRY)
+
+
+def vector(emissions, index=ACTIVITY_INDEX):
+    """``{activity: value}`` as an array aligned with the registry (unknown ids ignored)."""
+    values = np.zeros(len(index))
+    for activity, value in emissions.items():
+        position = index.get(activity)
+        if position is not None:
+            values[position] = value
+    return values
+
+
+def category_sums(values, codes=CATEGORY_CODES, n_categories=N_CATEGORIES):
+    """Group sums by category: ``(activities,) -> (categories,)`` or ``(users, activities) -> (users, categories)``."""
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        return np.bincount(codes, weights=values, minlength=n_categories)
+    rows = values.shape[0]
+    # Offset each row's codes so a single bincount produces every row's sums
+    flat_codes = (np.arange(rows)[:, None] * n_categories + codes).ravel()
+    return np.bincount(flat_codes, weights=values.ravel(), minlength=rows * n_categories).reshape(rows, n_categories)
+
+
+def top_n(values, n):
+    """Indices of the ``n`` largest entries along the last axis, largest first."""
+    values = np.asarray(values, dtype=np.float64)
+    n = min(n, values.shape[-1])
+    if n <= 0:
+        return np.empty(values.shape[:-1] + (0,), dtype=np.intp)
+    part = np.argpartition(-values, n - 1, axis=-1)[..., :n]
+    order = np.argsort(-np.take_along_axis(values, part, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(part, order, axis=-1)
+
+
+def category_totals(values):
+    """Positive category sums of one vector as ``{label: kg}``."""
+    sums = category_sums(values)
+    return {category.label: float(sums[category.index]) for category in CATEGORY_REGISTRY if sums[category.index] > 0}
+
+
+def top_activities(values, n=10, activities=ACTIVITIES):
+    """The ``n`` largest positive activities of one vector as ``[(activity, kg), ...]``."""
+    values = np.asarray(values, dtype=np.float64)
+    return [(activities[i], float(values[i])) for i in top_n(values, n) if values[i] > 0]
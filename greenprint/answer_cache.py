@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Semantic cache of chatbot answers.
+
+A question whose embedding is within ``threshold`` cosine similarity of an
+earlier one gets the stored answer back instead of a new LLM round trip.
+Cached question vectors sit in one preallocated NumPy matrix, so a lookup is a
+single matrix-vector product. Entries expire after ``ttl`` seconds. When the
+cache is full, the least recently used entry is replaced. Everything is
+dropped when the vector index fingerprint changes.
+"""
+import hashlib
+import re
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Words that tie a question to earlier turns ("what about it?", "tell me more")
+_REFERRING_WORDS = re.compile(
+    r"\b(it|its|that|this|those|these|they|them|their|he|she|above|previous|earlier|more|else|again|also)\b",
+    re.IGNORECASE)
+
+
+def index_fingerprint(persist_dir):
+    """Hash of the names, sizes and modification times of the files in ``persist_dir``."""
+    digest = hashlib.sha256()
+    for path in sorted(Path(persist_dir).iterdir()):
+        if path.is_file():
+            stat = path.stat()
+            digest.update(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def is_self_contained(question):
+    """True when the question does not point back at the conversation so far."""
+    return not _REFERRING_WORDS.search(question)
+
+
+class SemanticAnswerCache:
+    """Thread-safe nearest-question answer cache."""
+
+    def __init__(self, dim, threshold=0.95, ttl=3600, maxsize=256, fingerprint=None):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+        self._vectors = np.zeros((maxsize, dim), dtype=np.float32)
+        self._expires = np.full(maxsize, -np.inf)  # -inf marks an empty slot
+        self._last_used = np.zeros(maxsize)
+        self._entries = [None] * maxsize
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return int(np.count_nonzero(self._expires > time.monotonic()))
+
+    def validate(self, fingerprint):
+        """Drop every entry if the index ``fingerprint`` differs from the cached one."""
+        with self._lock:
+            if fingerprint != self.fingerprint:
+                self._expires[:] = -np.inf
+                self._entries = [None] * len(self._entries)
+                self.fingerprint = fingerprint
+
+    def lookup(self, embedding):
+        """``(question, answer)`` of the closest live entry above the threshold, else None."""
+        query = _unit(embedding)
+        now = time.monotonic()
+        with self._lock:
+            scores = self._vectors @ query
+            scores[self._expires <= now] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._last_used[best] = now
+            return self._entries[best]
+
+    def store(self, question, embedding, answer):
+        now = time.monotonic()
+        with self._lock:
+            free = np.flatnonzero(self._expires <= now)
+            slot = int(free[0]) if len(free) else int(np.argmin(self._last_used))
+            self._vectors[slot] = _unit(embedding)
+            self._expires[slot] = now + self.ttl
+            self._last_used[slot] = now
+            self._entries[slot] = (question, answer)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Static report assets, loaded from disk and decoded once per process."""
+import threading
+from pathlib import Path
+
+from reportlab.lib.utils import ImageReader
+
+ROOT = Path(__file__).resolve().parent.parent
+IMAGES = {
+    "logo": ROOT / "GreenPrint_logo.png",
+}
+
+_images = {}
+_lock = threading.Lock()
+
+
+def image(name):
+    """Pre-decoded ``ImageReader`` for a bundled image.
+
+    The pixel data is decoded on first use; every later report build reuses
+    the same object, so ReportLab does not decode the file again.
+    """
+    reader = _images.get(name)
+    if reader is None:
+        with _lock:
+            reader = _images.get(name)
+            if reader is None:
+                reader = ImageReader(str(IMAGES[name]))
+                reader.getSize()
+                reader.getRGBData()
+                _images[name] = reader
+    return reader
+
+
+def logo():
+    """The GreenPrint logo, or None if the file cannot be loaded."""
+    try:
+        return image("logo")
+    except (OSError, KeyError) as e:
+        print(f"Error loading logo: {e}")
+        return None
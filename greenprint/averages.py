@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Per-capita monthly CO2 averages indexed by normalized country name."""
+import math
+import re
+
+EU_AVERAGE = "European Union (27)"
+WORLD_AVERAGE = "World"
+
+# Normalized alternative spelling -> canonical name used in per_capita_filtered_monthly.csv
+ALIASES = {
+    "czech": "Czechia",
+    "czech republic": "Czechia",
+    "slovak republic": "Slovakia",
+    "the netherlands": "Netherlands",
+    "holland": "Netherlands",
+    "eu": EU_AVERAGE,
+    "eu27": EU_AVERAGE,
+    "eu average": EU_AVERAGE,
+    "european union": EU_AVERAGE,
+    "world average": WORLD_AVERAGE,
+}
+
+
+def normalize_country(name):
+    """Case-, whitespace- and underscore-insensitive form of a country name."""
+    return re.sub(r"\s+", " ", str(name).replace("_", " ")).strip().casefold()
+
+
+class CountryAverages:
+    """O(1) per-capita average lookup that understands the alias table.
+
+    ``averages["Czech"]`` resolves to the ``Czechia`` row; names that cannot be
+    resolved raise ``KeyError`` instead of quietly producing no value.
+    """
+
+    def __init__(self, countries, values, aliases=ALIASES):
+        self.countries = []
+        self.values = []
+        self._index = {}
+        for name, value in zip(countries, values):
+            if value is None or math.isnan(value):
+                continue
+            self._index[normalize_country(name)] = len(self.countries)
+            self.countries.append(name)
+            self.values.append(float(value))
+        for alias, canonical in aliases.items():
+            position = self._index.get(normalize_country(canonical))
+            if position is not None:
+                self._index.setdefault(normalize_country(alias), position)
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df["Country"].tolist(), df["PerCapitaCO2"].astype(float).tolist())
+
+    def canonical(self, name):
+        """Canonical dataset name for ``name``; raises ``KeyError`` if unknown."""
+        return self.countries[self._position(name)]
+
+    def _position(self, name):
+        try:
+            return self._index[normalize_country(name)]
+        except KeyError:
+            raise KeyError(f"No per-capita average for country {name!r}") from None
+
+    def __getitem__(self, name):
+        return self.values[self._position(name)]
+
+    def __contains__(self, name):
+        return normalize_country(name) in self._index
+
+    def get(self, name, default=None):
+        position = self._index.get(normalize_country(name))
+        return default if position is None else self.values[position]
+
+    def values_for(self, names):
+        """Averages aligned with ``names`` (NaN where unknown)."""
+        return [self.get(name, math.nan) for name in names]
+
+    def missing(self, names):
+        """Names from ``names`` that cannot be resolved."""
+        return [name for name in names if name not in self]
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""Headless bulk footprint scoring.
+
+Reads survey rows (a ``Country`` column plus one monthly-quantity column per
+activity) in fixed-size chunks and writes per-activity, per-category and total
+kg CO2 for every row. Only one chunk is held in memory at a time.
+
+Usage::
+
+    python -m greenprint.batch survey.csv footprints.parquet --chunksize 50000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from greenprint.activities import ACTIVITIES, CATEGORY_REGISTRY
+from greenprint.aggregate import category_sums
+from greenprint.datasets import load_datasets
+from greenprint.factors import FactorMatrix
+
+COUNTRY_COLUMN = "Country"
+
+
+class _CsvSink:
+    def __init__(self, path):
+        self.path = path
+        self._header = True
+
+    def write(self, frame):
+        frame.to_csv(self.path, mode="w" if self._header else "a", header=self._header, index=False)
+        self._header = False
+
+    def close(self):
+        pass
+
+
+class _ParquetSink:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet output requires 'pyarrow' (`pip install pyarrow`).") from e
+        self._pa, self._pq = pa, pq
+        self.path = path
+        self._writer = None
+        self._schema = None
+
+    def write(self, frame):
+        if self._writer is None:
+            # Pinned from the column dtypes, never inferred from values: an all-empty
+            # chunk must not change the type of a column part way through the file
+            self._schema = self._pa.schema([
+                (name, self._pa.float64() if pd.api.types.is_numeric_dtype(dtype) else self._pa.string())
+                for name, dtype in frame.dtypes.items()
+            ])
+            self._writer = self._pq.ParquetWriter(self.path, self._schema)
+        self._writer.write_table(self._pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _open_sink(path):
+    suffix = Path(path).suffix.lower()
+    if suffix in (".parquet", ".pq"):
+        return _ParquetSink(path)
+    if suffix == ".csv":
+        return _CsvSink(path)
+    raise ValueError(f"Unsupported output format '{suffix}'; use .csv or .parquet.")
+
+
+class BatchScorer:
+    """Vectorized scoring of quantity rows against a ``FactorMatrix``."""
+
+    def __init__(self, factors):
+        self.activities = list(ACTIVITIES)
+        self.countries = pd.Index(factors.countries)
+        # Transposed so that fancy-indexing by country code yields (rows, activities)
+        self._by_country = np.ascontiguousarray(factors.aligned(self.activities).T)
+        self.category_keys = [category.id for category in CATEGORY_REGISTRY]
+
+    def score(self, chunk):
+        """Return the scored frame for one chunk of input rows."""
+        if COUNTRY_COLUMN not in chunk.columns:
+            raise ValueError(f"Input is missing the '{COUNTRY_COLUMN}' column.")
+        codes = self.countries.get_indexer(chunk[COUNTRY_COLUMN].astype(str).str.strip())
+        known = codes >= 0
+
+        quantities = (chunk.reindex(columns=self.activities, fill_value=0.0)
+                      .apply(pd.to_numeric, errors="coerce").fillna(0.0).to_numpy(dtype=np.float64))
+        per_activity = quantities * self._by_country[np.where(known, codes, 0)]
+        per_activity[~known] = np.nan
+        per_category = category_sums(per_activity)
+        total = per_activity.sum(axis=1)
+
+        passthrough = chunk.drop(columns=[c for c in self.activities if c in chunk.columns]).reset_index(drop=True)
+        scored = pd.DataFrame(per_activity, columns=[f"{a}_kg" for a in self.activities])
+        scored[[f"{c}_kg" for c in self.category_keys]] = per_category
+        scored["total_kg"] = total
+        return pd.concat([passthrough, scored], axis=1)
+
+
+def score_file(input_path, output_path, factors=None, chunksize=50_000, progress=None):
+    """Score ``input_path`` chunk by chunk into ``output_path`` (.csv or .parquet).
+
+    Returns ``(rows, unknown_country_rows)``. Rows whose country has no factors
+    are kept with NaN emissions so the output stays aligned with the input.
+    Columns other than the activities are passed through unchanged as text.
+    """
+    if factors is None:
+        factors = load_datasets().factors
+    scorer = BatchScorer(factors)
+    # Pass-through columns are read as text so their type is the same in every chunk
+    header = pd.read_csv(input_path, nrows=0).columns
+    text_columns = {column: str for column in header if column not in scorer.activities}
+    sink = _open_sink(output_path)
+    rows = unknown = 0
+    try:
+        for chunk in pd.read_csv(input_path, chunksize=chunksize, dtype=text_columns):
+            scored = scorer.score(chunk)
+            sink.write(scored)
+            rows += len(scored)
+            unknown += int(scored["total_kg"].isna().sum())
+            if progress:
+                progress(rows)
+    finally:
+        sink.close()
+    return rows, unknown
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score household survey rows in bulk.")
+    parser.add_argument("input", help="CSV with a Country column and one quantity column per activity")
+    parser.add_argument("output", help="Destination .csv or .parquet file")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="Rows held in memory at once")
+    parser.add_argument("--factors", help="Emission factor CSV (defaults to the bundled dataset)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    factors = FactorMatrix.from_frame(pd.read_csv(args.factors)) if args.factors else None
+    rows, unknown = score_file(args.input, args.output, factors, args.chunksize,
+                               progress=lambda n: print(f"\r{n:,} rows scored", end="", file=sys.stderr))
+    print(f"\nDone: {rows:,} rows in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    if unknown:
+        print(f"Warning: {unknown:,} rows had an unknown country and were left empty.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
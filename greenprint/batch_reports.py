@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Monthly PDF reports for many users, rendered across a process pool.
+
+Footprints are streamed out of the history store, rendered by worker
+processes and written into a ZIP archive (or a directory) as they complete.
+At most ``2 x workers`` reports are in flight, so memory does not grow with
+the number of users.
+
+Usage::
+
+    python -m greenprint.batch_reports 2025-09 reports.zip --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from greenprint.assets import logo
+from greenprint.aggregate import category_totals, top_activities, vector
+from greenprint.history import DEFAULT_PATH, HistoryStore
+from greenprint.report import generate_pdf_report
+
+
+def render_report(job):
+    """Worker entry point: ``(user_id, name, month, entries)`` -> ``(user_id, pdf bytes)``."""
+    user_id, name, month, entries = job
+    emissions = vector({activity: emission for activity, _category, _quantity, emission in entries})
+    subtitle = f"{name} - {month}" if name else month
+    pdf = generate_pdf_report(
+        logo_data=logo(),  # decoded once per worker process
+        category_data=category_totals(emissions),
+        top_activities_data=dict(top_activities(emissions, n=10)),
+        subtitle=subtitle,
+    ).getvalue()
+    return user_id, pdf
+
+
+class _ZipSink:
+    def __init__(self, path):
+        # PDF streams are already compressed; storing avoids burning CPU twice
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED)
+
+    def write(self, name, data):
+        self._zip.writestr(name, data)
+
+    def close(self):
+        self._zip.close()
+
+
+class _DirectorySink:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def write(self, name, data):
+        (self.path / name).write_bytes(data)
+
+    def close(self):
+        pass
+
+
+def generate_month_reports(store, month, output, workers=None, consented_only=True, progress=None):
+    """Render every stored footprint of ``month`` into ``output`` (``.zip`` or directory).
+
+    ``progress(done, total)`` is called after each report is written. Returns
+    ``(written, failed)`` counts.
+    """
+    workers = workers or os.cpu_count() or 1
+    total = store.count_month_reports(month, consented_only)
+    sink = _ZipSink(output) if str(output).lower().endswith(".zip") else _DirectorySink(output)
+    jobs = ((user_id, name, month, entries)
+            for user_id, name, entries in store.iter_month_reports(month, consented_only))
+    written = failed = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < 2 * workers:
+                    job = next(jobs, None)
+                    if job is None:
+                        exhausted = True
+                    else:
+                        pending.add(pool.submit(render_report, job))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        user_id, pdf = future.result()
+                    except Exception as e:
+                        print(f"Report generation failed: {e}", file=sys.stderr)
+                        pdf = None
+                    if pdf:
+                        sink.write(f"GreenPrint_{month}_{user_id}.pdf", pdf)
+                        written += 1
+                    else:
+                        failed += 1
+                    if progress:
+                        progress(written + failed, total)
+    finally:
+        sink.close()
+    return written, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render monthly PDF reports for consented users.")
+    parser.add_argument("month", help="Month to report on, as YYYY-MM")
+    parser.add_argument("output", help="Destination .zip file or directory")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--db", default=str(DEFAULT_PATH), help="History database")
+    parser.add_argument("--all-users", action="store_true", help="Include users who have not given consent")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    store = HistoryStore(args.db)
+    written, failed = generate_month_reports(
+        store, args.month, args.output, args.workers, consented_only=not args.all_users,
+        progress=lambda done, total: print(f"\r{done:,}/{total:,} reports", end="", file=sys.stderr))
+    print(f"\nDone: {written:,} reports in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    if failed:
+        print(f"Warning: {failed:,} reports failed.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""Pure footprint calculations shared by the pages, batch jobs and reports."""
+from greenprint.averages import EU_AVERAGE, WORLD_AVERAGE
+
+TREE_ABSORPTION_MONTHLY_KG = 21.77 / 12.0  # CO2 absorbed by one tree per month
+
+
+def tree_equivalent(total_kg):
+    """Number of trees needed to absorb ``total_kg`` of CO2 in a month."""
+    return total_kg / TREE_ABSORPTION_MONTHLY_KG
+
+
+def comparison_averages(country, averages):
+    """Country, EU and World averages; ``avg`` is None where no data exists."""
+    return {
+        "country": {"name": country, "avg": averages.get(country)},
+        "eu": {"name": "EU Average", "avg": averages.get(EU_AVERAGE)},
+        "world": {"name": "World Average", "avg": averages.get(WORLD_AVERAGE)},
+    }
+
+
+def comparison_color(total_kg, world_avg):
+    """Bar colour for the user's footprint and the reason shown next to it."""
+    if world_avg is None:
+        return '#1a9850', ""
+    if total_kg > world_avg:
+        return '#e41a1c', "(above world average)"
+    return '#1a9850', "(below or equal to world average)"
+
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Per-session chat state with bounded history and idle reclaim.
+
+Each browser session gets its own memory buffer from a ``SessionPool``, so
+users never share a conversation; the Chatbot page builds the session's chat
+engine around it on every run. Each buffer has a token budget for the prompt,
+and ``trim_history`` keeps the stored transcript to the last few turns.
+Sessions that stay idle longer than ``idle_seconds`` are dropped the next time
+the pool is used.
+"""
+import threading
+import time
+
+MEMORY_TOKEN_LIMIT = 1500
+MAX_TURNS = 6
+IDLE_SECONDS = 30 * 60
+
+
+class SessionPool:
+    """Thread-safe ``session id -> factory()`` mapping with idle expiry."""
+
+    def __init__(self, factory, idle_seconds=IDLE_SECONDS, max_sessions=1000):
+        self.factory = factory
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self._sessions = {}  # session id -> [value, last used]
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """The session's value, created on first use; also reclaims idle sessions."""
+        now = time.monotonic()
+        with self._lock:
+            self._reclaim(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                if len(self._sessions) >= self.max_sessions:
+                    oldest = min(self._sessions, key=lambda key: self._sessions[key][1])
+                    del self._sessions[oldest]
+                entry = self._sessions[session_id] = [self.factory(), now]
+            entry[1] = now
+            return entry[0]
+
+    def discard(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def reclaim(self):
+        """Drop sessions idle for longer than ``idle_seconds``; returns how many."""
+        with self._lock:
+            return self._reclaim(time.monotonic())
+
+    def _reclaim(self, now):
+        idle = [key for key, (_, last_used) in self._sessions.items() if now - last_used > self.idle_seconds]
+        for key in idle:
+            del self._sessions[key]
+        return len(idle)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+def trim_history(memory, max_turns=MAX_TURNS):
+    """Keep only the last ``max_turns`` user turns (with their replies) in ``memory``."""
+    messages = memory.get_all()
+    user_positions = [i for i, message in enumerate(messages) if _role(message) == "user"]
+    if len(user_positions) > max_turns:
+        memory.set(messages[user_positions[-max_turns]:])
+
+
+def _role(message):
+    role = getattr(message, "role", None)
+    return getattr(role, "value", role)
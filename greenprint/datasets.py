@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""Bundled emission datasets, compiled once into a memory-mappable cache.
+
+The CSVs that ship with the repo are hashed on start-up. The first process to
+see a given content hash parses and validates them and writes a compact binary
+copy (``.npy`` arrays + a small JSON sidecar) under ``CACHE_DIR``; later starts
+memory-map that copy instead of re-parsing. Fetching from a remote location is
+opt-in only, through ``remote_base_url`` or the ``GREENPRINT_DATA_URL``
+environment variable.
+"""
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import urllib.request
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from greenprint.averages import CountryAverages
+from greenprint.factors import FactorMatrix
+
+ROOT = Path(__file__).resolve().parent.parent
+EMISSION_FACTORS_CSV = "emission_factor_formated.csv"
+PER_CAPITA_CSV = "per_capita_filtered_monthly.csv"
+CACHE_DIR = Path(os.environ.get("GREENPRINT_CACHE_DIR", ROOT / ".greenprint_cache"))
+REMOTE_URL_ENV = "GREENPRINT_DATA_URL"
+FORMAT_VERSION = 1
+
+Datasets = namedtuple("Datasets", ["factors", "per_capita", "averages", "key"])
+
+
+def _read_sources(data_dir, remote_base_url):
+    if remote_base_url:
+        base = remote_base_url.rstrip("/")
+        with urllib.request.urlopen(f"{base}/{EMISSION_FACTORS_CSV}", timeout=15) as response:
+            emission_raw = response.read()
+        with urllib.request.urlopen(f"{base}/{PER_CAPITA_CSV}", timeout=15) as response:
+            per_capita_raw = response.read()
+        return emission_raw, per_capita_raw
+    data_dir = Path(data_dir)
+    return (data_dir / EMISSION_FACTORS_CSV).read_bytes(), (data_dir / PER_CAPITA_CSV).read_bytes()
+
+
+def _content_key(emission_raw, per_capita_raw):
+    digest = hashlib.sha256()
+    digest.update(f"v{FORMAT_VERSION}\0".encode())
+    digest.update(emission_raw)
+    digest.update(b"\0")
+    digest.update(per_capita_raw)
+    return digest.hexdigest()[:20]
+
+
+def _compile(emission_raw, per_capita_raw):
+    """Parse and validate both CSVs; returns ``(factors, per_capita)``."""
+    factors = FactorMatrix.from_frame(pd.read_csv(io.BytesIO(emission_raw)))
+    if not factors.activities or not factors.countries:
+        raise ValueError("Emission data has no activities or no countries.")
+    if (factors.values < 0).any():
+        raise ValueError("Emission data contains negative factors.")
+
+    per_capita = pd.read_csv(io.BytesIO(per_capita_raw))
+    per_capita.columns = per_capita.columns.str.strip()
+    missing = {"Country", "PerCapitaCO2"} - set(per_capita.columns)
+    if missing:
+        raise ValueError(f"Per-capita data is missing columns: {sorted(missing)}.")
+    per_capita["Country"] = per_capita["Country"].astype(str).str.strip()
+    per_capita["PerCapitaCO2"] = pd.to_numeric(per_capita["PerCapitaCO2"], errors="coerce")
+    if "Year" not in per_capita.columns:
+        per_capita["Year"] = 0
+    per_capita["Year"] = pd.to_numeric(per_capita["Year"], errors="coerce").fillna(0).astype(np.int32)
+    return factors, per_capita[["Country", "Year", "PerCapitaCO2"]]
+
+
+def _write_compiled(path, key, factors, per_capita):
+    """Write the compiled form into ``path`` atomically (temp dir + rename)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=f".{path.name}-", dir=path.parent))
+    try:
+        np.save(tmp / "factors.npy", np.ascontiguousarray(factors.values))
+        np.save(tmp / "per_capita.npy", per_capita["PerCapitaCO2"].to_numpy(dtype=np.float64))
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "key": key,
+            "activities": list(factors.activities),
+            "countries": list(factors.countries),
+            "per_capita_countries": per_capita["Country"].tolist(),
+            "per_capita_years": per_capita["Year"].tolist(),
+        }
+        (tmp / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        # Another process may have won the race, or the directory is read-only
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _load_compiled(path, key):
+    meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+    if meta.get("format_version") != FORMAT_VERSION or meta.get("key") != key:
+        raise ValueError(f"Stale dataset cache at {path}.")
+    values = np.load(path / "factors.npy", mmap_mode="r")
+    per_capita_values = np.load(path / "per_capita.npy", mmap_mode="r")
+    if values.shape != (len(meta["activities"]), len(meta["countries"])):
+        raise ValueError(f"Corrupt dataset cache at {path}: factor shape mismatch.")
+    if per_capita_values.shape != (len(meta["per_capita_countries"]),):
+        raise ValueError(f"Corrupt dataset cache at {path}: per-capita shape mismatch.")
+    factors = FactorMatrix(meta["activities"], meta["countries"], values)
+    per_capita = pd.DataFrame({
+        "Country": meta["per_capita_countries"],
+        "Year": np.asarray(meta["per_capita_years"], dtype=np.int32),
+        "PerCapitaCO2": np.asarray(per_capita_values),
+    })
+    return factors, per_capita
+
+
+def load_datasets(data_dir=ROOT, remote_base_url=None, cache_dir=CACHE_DIR):
+    """Load emission factors and per-capita averages.
+
+    Reads the bundled CSVs from ``data_dir`` unless a remote base URL is given
+    explicitly (or through ``GREENPRINT_DATA_URL``). Returns a ``Datasets``
+    tuple of ``(FactorMatrix, per-capita DataFrame, CountryAverages, content key)``.
+    """
+    if remote_base_url is None:
+        remote_base_url = os.environ.get(REMOTE_URL_ENV) or None
+    emission_raw, per_capita_raw = _read_sources(data_dir, remote_base_url)
+    key = _content_key(emission_raw, per_capita_raw)
+    path = Path(cache_dir) / f"datasets-{key}"
+    try:
+        factors, per_capita = _load_compiled(path, key)
+    except (OSError, ValueError, KeyError):
+        factors, per_capita = _compile(emission_raw, per_capita_raw)
+        shutil.rmtree(path, ignore_errors=True)
+        _write_compiled(path, key, factors, per_capita)
+    return Datasets(factors, per_capita, CountryAverages.from_frame(per_capita), key)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Cache of query embeddings keyed by normalised query text.
+
+Lookups hit an in-process LRU first and then a SQLite table (WAL mode) that
+every server process shares, so a question embedded once is not sent through
+the sentence-transformer again. Vectors are stored as raw float32 bytes.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from greenprint.cache import LRUCache
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_PATH = Path(os.environ.get("GREENPRINT_EMBEDDING_CACHE_DB",
+                                   ROOT / ".greenprint_data" / "query_embeddings.sqlite3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_embeddings (
+    model TEXT NOT NULL,
+    query TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    compute_seconds REAL NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (model, query)
+) WITHOUT ROWID;
+"""
+
+
+def normalize_query(text):
+    """Case-folded query with whitespace collapsed and trailing punctuation dropped."""
+    return re.sub(r"\s+", " ", str(text)).strip().rstrip("?!. ").casefold()
+
+
+class QueryEmbeddingCache:
+    """Two-level (memory, then disk) cache for one embedding model.
+
+    ``path=None`` keeps the cache in memory only.
+    """
+
+    def __init__(self, model_name, path=DEFAULT_PATH, maxsize=1024):
+        self.model_name = model_name
+        self.memory = LRUCache(maxsize=maxsize)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self._stats_lock = threading.Lock()
+        self._conn = None
+        self._lock = threading.Lock()
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=5)
+            with self._lock:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.executescript(_SCHEMA)
+
+    def get_or_compute(self, text, compute, record_hit=True):
+        """Embedding of ``text``; ``compute(text)`` runs only when neither level has it.
+
+        ``record_hit=False`` leaves the hit counters alone, for a second lookup of
+        a question whose first lookup was already counted.
+        """
+        key = normalize_query(text)
+        entry = self.memory.get(key)
+        if entry is not None:
+            if record_hit:
+                self._count("memory_hits", entry[1])
+            return entry[0]
+        entry = self._load(key)
+        if entry is not None:
+            if record_hit:
+                self._count("disk_hits", entry[1])
+        else:
+            start = time.perf_counter()
+            vector = np.asarray(compute(text), dtype=np.float32)
+            entry = (vector, time.perf_counter() - start)
+            self._count("misses", 0.0)
+            self._store(key, entry)
+        entry[0].flags.writeable = False
+        self.memory.put(key, entry)
+        return entry[0]
+
+    def _count(self, name, seconds_saved):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+            self.seconds_saved += seconds_saved
+
+    def _load(self, key):
+        if self._conn is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector, compute_seconds FROM query_embeddings WHERE model = ? AND query = ?",
+                (self.model_name, key)).fetchone()
+        return (np.frombuffer(row[0], dtype=np.float32).copy(), row[1]) if row else None
+
+    def _store(self, key, entry):
+        if self._conn is None:
+            return
+        try:
+            with self._lock, self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?, ?)",
+                                   (self.model_name, key, entry[0].tobytes(), entry[1], time.time()))
+        except sqlite3.OperationalError as e:
+            # Another process holding the write lock only costs us persistence
+            print(f"Could not persist query embedding: {e}")
+
+    def stats(self):
+        """Counters for this process: hits per level, hit rate and embedding time saved.
+
+        Time saved is the original compute time of every entry served from cache.
+        """
+        with self._stats_lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "seconds_saved": self.seconds_saved,
+            }
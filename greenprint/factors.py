@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Dense activity x country emission-factor matrix."""
+import numpy as np
+
+
+class FactorMatrix:
+    """Emission factors as a dense ``(activities, countries)`` float array.
+
+    Row and column positions are resolved through plain dicts, so finding an
+    activity row or a country column is O(1). Missing factors are stored as 0.0
+    so they simply contribute nothing to a footprint.
+    """
+
+    def __init__(self, activities, countries, values):
+        self.activities = tuple(activities)
+        self.countries = tuple(countries)
+        self.values = np.asarray(values, dtype=np.float64)
+        if self.values.shape != (len(self.activities), len(self.countries)):
+            raise ValueError(
+                f"Factor values have shape {self.values.shape}, expected "
+                f"({len(self.activities)}, {len(self.countries)})."
+            )
+        if np.isnan(self.values).any():
+            self.values = np.nan_to_num(self.values, nan=0.0)
+        self.activity_index = {name: i for i, name in enumerate(self.activities)}
+        self.country_index = {name: j for j, name in enumerate(self.countries)}
+        self._aligned = {}
+
+    @classmethod
+    def from_frame(cls, df, activity_column="Activity"):
+        """Build the matrix from the ``emission_factor_formated.csv`` layout."""
+        df = df.copy()
+        df.columns = df.columns.str.strip()
+        if activity_column not in df.columns:
+            raise ValueError(f"Emission data is missing '{activity_column}' column.")
+        df[activity_column] = df[activity_column].astype(str).str.strip()
+        df = df.drop_duplicates(subset=activity_column, keep="first")
+        countries = [col for col in df.columns if col != activity_column]
+        values = df[countries].apply(lambda col: col.astype(float)).to_numpy()
+        return cls(df[activity_column].tolist(), countries, values)
+
+    def aligned(self, activities):
+        """Factor rows re-ordered to ``activities`` (zero rows for unknown ones).
+
+        The result is cached per activity tuple, so pages that always ask for
+        the same activity list pay the fancy-indexing cost once per process.
+        """
+        key = tuple(activities)
+        matrix = self._aligned.get(key)
+        if matrix is None:
+            rows = np.array([self.activity_index.get(a, -1) for a in key], dtype=np.intp)
+            matrix = np.zeros((len(key), len(self.countries)), dtype=np.float64)
+            known = rows >= 0
+            matrix[known] = self.values[rows[known]]
+            matrix.setflags(write=False)
+            self._aligned[key] = matrix
+        return matrix
+
+    def project(self, activities, quantities):
+        """Total footprint of the same ``quantities`` in every country.
+
+        One vector-matrix product over the aligned factors; the result is
+        ordered like ``self.countries``.
+        """
+        return np.asarray(quantities, dtype=np.float64) @ self.aligned(activities)
+
+    def rank_countries(self, activities, quantities):
+        """``(country, total)`` pairs for the projected footprint, lowest first."""
+        totals = self.project(activities, quantities)
+        order = np.argsort(totals, kind="stable")
+        return [(self.countries[j], float(totals[j])) for j in order]
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""llama-index LLM that sends every request through greenprint.llm_gateway."""
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, MessageRole
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.llms import CompletionResponse, CustomLLM, LLMMetadata
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+
+
+def to_gateway_messages(messages):
+    """``[{"role", "content"}]`` for the gateway, in the shape Mistral's chat template accepts.
+
+    The template takes one leading system message and strictly alternating
+    user/assistant turns, so all system messages are merged into the first and
+    consecutive turns of the same role are joined.
+    """
+    system = [m.content for m in messages if m.role == MessageRole.SYSTEM and m.content]
+    turns = [{"role": "system", "content": "\n\n".join(system)}] if system else []
+    for message in messages:
+        if message.role == MessageRole.SYSTEM:
+            continue
+        role = "assistant" if message.role == MessageRole.ASSISTANT else "user"
+        content = message.content or ""
+        if turns and turns[-1]["role"] == role:
+            turns[-1]["content"] += "\n\n" + content
+        else:
+            turns.append({"role": role, "content": content})
+    return turns
+
+
+class GatewayLLM(CustomLLM):
+    """Chat LLM backed by an ``LLMGateway``.
+
+    Chat engines call ``chat``/``stream_chat``, which send the conversation as
+    chat messages; the serving side applies the model's chat template and stop
+    tokens. ``complete`` sends the prompt as a single user turn.
+    """
+
+    model_name: str = "greenprint-gateway"
+    context_window: int = 8192
+    num_output: int = 512
+    _gateway = PrivateAttr()
+
+    def __init__(self, gateway, **kwargs):
+        super().__init__(**kwargs)
+        self._gateway = gateway
+
+    @property
+    def metadata(self):
+        return LLMMetadata(context_window=self.context_window, num_output=self.num_output,
+                           model_name=self.model_name, is_chat_model=True)
+
+    @llm_chat_callback()
+    def chat(self, messages, **kwargs):
+        text = self._gateway.complete(to_gateway_messages(messages), max_tokens=self.num_output)
+        return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=text))
+
+    @llm_chat_callback()
+    def stream_chat(self, messages, **kwargs):
+        def gen():
+            text = ""
+            for delta in self._gateway.stream_complete(to_gateway_messages(messages), max_tokens=self.num_output):
+                text += delta
+                yield ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=text), delta=delta)
+        return gen()
+
+    @llm_completion_callback()
+    def complete(self, prompt, formatted=False, **kwargs):
+        text = self._gateway.complete([{"role": "user", "content": prompt}], max_tokens=self.num_output)
+        return CompletionResponse(text=text)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt, formatted=False, **kwargs):
+        def gen():
+            text = ""
+            for delta in self._gateway.stream_complete([{"role": "user", "content": prompt}],
+                                                       max_tokens=self.num_output):
+                text += delta
+                yield CompletionResponse(text=text, delta=delta)
+        return gen()
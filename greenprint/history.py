@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""Persistent monthly footprint history in an embedded SQLite database.
+
+Each saved month is written in a single transaction (one ``executemany`` for
+the activity rows). Trend queries run in SQL with window functions over the
+``(user_id, month)`` primary key, so only the handful of result rows reach
+Python.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_PATH = Path(os.environ.get("GREENPRINT_HISTORY_DB", ROOT / ".greenprint_data" / "history.sqlite3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    name TEXT,
+    email TEXT,
+    consent INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS monthly_footprints (
+    user_id TEXT NOT NULL,
+    month TEXT NOT NULL,
+    country TEXT,
+    total REAL NOT NULL,
+    recorded_at TEXT NOT NULL,
+    PRIMARY KEY (user_id, month)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS activity_emissions (
+    user_id TEXT NOT NULL,
+    month TEXT NOT NULL,
+    activity TEXT NOT NULL,
+    category TEXT NOT NULL,
+    quantity REAL NOT NULL,
+    emission REAL NOT NULL,
+    PRIMARY KEY (user_id, month, activity)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_activity_emissions_category
+    ON activity_emissions (user_id, category, month);
+"""
+
+
+def user_key(profile):
+    """Stable, non-reversible id for a profile from ``pages/1_Profile.py`` (keyed by email)."""
+    email = str(profile.get("email", "")).strip().casefold()
+    if not email:
+        raise ValueError("Profile has no email address.")
+    return hashlib.sha256(email.encode("utf-8")).hexdigest()[:24]
+
+
+def month_key(value=None):
+    """``YYYY-MM`` for a date/datetime (defaults to the current month)."""
+    value = value or datetime.now(timezone.utc)
+    return f"{value.year:04d}-{value.month:02d}"
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class HistoryStore:
+    """Thread-safe wrapper around one SQLite connection (WAL mode)."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = Path(path)
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def upsert_user(self, profile):
+        user_id = user_key(profile)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO users (user_id, name, email, consent, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET name=excluded.name, email=excluded.email, "
+                "consent=excluded.consent, updated_at=excluded.updated_at",
+                (user_id, profile.get("name"), profile.get("email"), int(bool(profile.get("consent"))), _now()),
+            )
+        return user_id
+
+    def record_month(self, user_id, month, country, entries):
+        """Save (or replace) one month; ``entries`` yields ``(activity, category, quantity, emission)``."""
+        self.record_many([(user_id, month, country, entries)])
+
+    def record_many(self, records):
+        """Save many ``(user_id, month, country, entries)`` records in one transaction."""
+        recorded_at = _now()
+        with self._lock, self._conn:
+            for user_id, month, country, entries in records:
+                rows = [(user_id, month, activity, category, float(quantity), float(emission))
+                        for activity, category, quantity, emission in entries]
+                self._conn.execute("DELETE FROM activity_emissions WHERE user_id = ? AND month = ?", (user_id, month))
+                self._conn.executemany(
+                    "INSERT INTO activity_emissions (user_id, month, activity, category, quantity, emission) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO monthly_footprints (user_id, month, country, total, recorded_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (user_id, month, country, sum(row[5] for row in rows), recorded_at))
+
+    def monthly_trend(self, user_id, window=3, limit=24):
+        """Most recent ``limit`` months as ``(month, total, rolling_avg, delta)`` rows, oldest first.
+
+        ``rolling_avg`` averages the last ``window`` months; ``delta`` is the
+        change from the previous saved month (None for the first one).
+        """
+        query = """
+            SELECT month, total, rolling_avg, delta FROM (
+                SELECT month, total,
+                       AVG(total) OVER (ORDER BY month ROWS BETWEEN ? PRECEDING AND CURRENT ROW) AS rolling_avg,
+                       total - LAG(total) OVER (ORDER BY month) AS delta
+                FROM monthly_footprints WHERE user_id = ?
+                ORDER BY month DESC LIMIT ?
+            ) ORDER BY month
+        """
+        with self._lock:
+            return self._conn.execute(query, (max(window, 1) - 1, user_id, limit)).fetchall()
+
+    def category_trend(self, user_id, since=None):
+        """``{category: [(month, emission), ...]}`` for months from ``since`` onwards."""
+        query = ("SELECT category, month, SUM(emission) FROM activity_emissions "
+                 "WHERE user_id = ? AND month >= ? GROUP BY category, month ORDER BY category, month")
+        series = {}
+        with self._lock:
+            for category, month, emission in self._conn.execute(query, (user_id, since or "")):
+                series.setdefault(category, []).append((month, emission))
+        return series
+
+    def month_entries(self, user_id, month):
+        """``(activity, category, quantity, emission)`` rows of one saved month."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT activity, category, quantity, emission FROM activity_emissions "
+                "WHERE user_id = ? AND month = ? ORDER BY emission DESC", (user_id, month)).fetchall()
+
+    def count_month_reports(self, month, consented_only=True):
+        """Number of users with a saved footprint for ``month``."""
+        query = ("SELECT COUNT(*) FROM monthly_footprints m JOIN users u ON u.user_id = m.user_id "
+                 "WHERE m.month = ?" + (" AND u.consent = 1" if consented_only else ""))
+        with self._lock:
+            return self._conn.execute(query, (month,)).fetchone()[0]
+
+    def iter_month_reports(self, month, consented_only=True, page_size=500):
+        """Yield ``(user_id, name, entries)`` for every user with a saved ``month``.
+
+        Users are read in keyset-paginated pages so the lock is never held
+        while the caller processes results and memory stays bounded.
+        """
+        query = ("SELECT m.user_id, u.name FROM monthly_footprints m JOIN users u ON u.user_id = m.user_id "
+                 "WHERE m.month = ? AND m.user_id > ?" + (" AND u.consent = 1" if consented_only else "") +
+                 " ORDER BY m.user_id LIMIT ?")
+        last = ""
+        while True:
+            with self._lock:
+                page = self._conn.execute(query, (month, last, page_size)).fetchall()
+            if not page:
+                return
+            for user_id, name in page:
+                yield user_id, name, self.month_entries(user_id, month)
+            last = page[-1][0]
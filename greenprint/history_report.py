@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""Multi-page monthly history report, laid out section by section.
+
+Unlike ``generate_pdf_report`` (one page, hand-positioned), this writer lays
+out repeated per-month sections with ReportLab's platypus engine. Sections are
+produced lazily from the history store while the document is being built, so
+the months and their flowables are never all in memory at once. ReportLab
+still keeps every finished page until the document is saved, compressed, so
+memory grows with the size of the compressed output. Output goes to a path or
+any writable binary file object.
+
+Usage::
+
+    python -m greenprint.history_report user@example.com history.pdf
+"""
+import argparse
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import (BaseDocTemplate, Flowable, Frame, KeepTogether, PageTemplate, Paragraph, Spacer,
+                                Table, TableStyle)
+
+from greenprint.activities import CATEGORY_LABELS, format_activity_name
+from greenprint.assets import logo
+from greenprint.history import DEFAULT_PATH, HistoryStore, user_key
+from greenprint.report import CO2_SUB, MARGIN
+from greenprint.report_charts import chart_height, draw_bar_chart
+
+LOOKAHEAD = 16  # flowables buffered ahead of the layout engine (keep-with-next chains)
+TOP_ACTIVITIES = 5
+
+
+class LazyFlowables:
+    """List-like view over a flowable iterator, consumed by ``BaseDocTemplate.build``.
+
+    The layout engine only looks at the front of its story (index, slice,
+    insert and delete near position 0), so the iterator is pulled a few items
+    at a time instead of being materialised up front.
+    """
+
+    def __init__(self, iterable, lookahead=LOOKAHEAD):
+        self._source = iter(iterable)
+        self._buffer = []
+        self._lookahead = lookahead
+
+    def _fill(self, n):
+        while len(self._buffer) < n:
+            try:
+                self._buffer.append(next(self._source))
+            except StopIteration:
+                break
+
+    def _fill_for(self, key):
+        if isinstance(key, slice):
+            self._fill(self._lookahead if key.stop is None else key.stop)
+        else:
+            self._fill(key + 1 if key >= 0 else self._lookahead)
+
+    def __len__(self):
+        self._fill(self._lookahead)
+        return len(self._buffer)
+
+    def __getitem__(self, key):
+        self._fill_for(key)
+        return self._buffer[key]
+
+    def __setitem__(self, key, value):
+        self._fill_for(key)
+        self._buffer[key] = value
+
+    def __delitem__(self, key):
+        self._fill_for(key)
+        del self._buffer[key]
+
+    def insert(self, index, value):
+        self._buffer.insert(index, value)
+
+
+class BarChartFlowable(Flowable):
+    """Horizontal bar chart from ``report_charts`` as a platypus flowable."""
+
+    def __init__(self, items, palette="Greens", axis_title=f"Emissions (kg {CO2_SUB})"):
+        super().__init__()
+        self.items = list(items)
+        self.palette = palette
+        self.axis_title = axis_title
+        self.height = chart_height(len(self.items), max_height=6 * cm)
+
+    def wrap(self, available_width, available_height):
+        self.width = available_width
+        return self.width, self.height
+
+    def draw(self):
+        draw_bar_chart(self.canv, 0, self.height, self.width, self.height, self.items,
+                       palette=self.palette, axis_title=self.axis_title)
+
+
+def _month_section(month, total, rolling_avg, delta, entries, styles):
+    by_category = {}
+    for _activity, category, _quantity, emission in entries:
+        by_category[category] = by_category.get(category, 0.0) + emission
+    change = "first saved month" if delta is None else f"{delta:+.1f} kg vs previous month"
+    rows = [["Category", f"kg {CO2_SUB}"]] + [
+        [CATEGORY_LABELS.get(category, category), f"{value:.1f}"]
+        for category, value in sorted(by_category.items(), key=lambda item: item[1], reverse=True)]
+    table = Table(rows, colWidths=[8 * cm, 3 * cm], hAlign="LEFT")
+    table.setStyle(TableStyle([
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, -1), 9),
+        ("ALIGN", (1, 0), (1, -1), "RIGHT"),
+        ("LINEBELOW", (0, 0), (-1, 0), 0.6, colors.HexColor("#52a58a")),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f0f8f5")]),
+    ]))
+    top = [(format_activity_name(activity), emission) for activity, _c, _q, emission in entries[:TOP_ACTIVITIES]
+           if emission > 0]
+    section = [
+        Paragraph(month, styles["Heading2"]),
+        Paragraph(f"Total: <b>{total:.1f} kg {CO2_SUB}</b> ({change}); "
+                  f"3-month average {rolling_avg:.1f} kg.", styles["BodyText"]),
+        Spacer(1, 0.2 * cm),
+        table,
+    ]
+    if top:
+        section += [Spacer(1, 0.3 * cm), BarChartFlowable(top, palette="Blues")]
+    return KeepTogether(section + [Spacer(1, 0.6 * cm)])
+
+
+def history_flowables(store, user_id, window=3, limit=1200):
+    """Yield the report's flowables, querying one month at a time."""
+    styles = getSampleStyleSheet()
+    trend = store.monthly_trend(user_id, window=window, limit=limit)
+    yield Paragraph("GreenPrint Monthly History", styles["Title"])
+    if not trend:
+        yield Paragraph("No saved months yet.", styles["BodyText"])
+        return
+    yield Paragraph(f"{len(trend)} months from {trend[0][0]} to {trend[-1][0]}.", styles["BodyText"])
+    yield Spacer(1, 0.4 * cm)
+    for month, total, rolling_avg, delta in trend:
+        yield _month_section(month, total, rolling_avg, delta, store.month_entries(user_id, month), styles)
+
+
+def _draw_page_frame(canv, doc):
+    canv.saveState()
+    width, height = A4
+    logo_img = logo()
+    if logo_img is not None:
+        img_w, img_h = logo_img.getSize()
+        draw_width = 2.5 * cm
+        draw_height = draw_width * img_h / float(img_w)
+        canv.drawImage(logo_img, width - MARGIN - draw_width, height - MARGIN / 2 - draw_height,
+                       width=draw_width, height=draw_height, preserveAspectRatio=True, mask='auto')
+    canv.setFont("Helvetica", 8)
+    canv.drawRightString(width - MARGIN, MARGIN / 2, f"Page {doc.page}")
+    canv.restoreState()
+
+
+def write_history_report(store, user_id, output, window=3, months=1200):
+    """Write the last ``months`` saved months of ``user_id`` to ``output`` (path or binary file object).
+
+    Sections are laid out lazily; the finished pages are held, compressed, until the document is saved.
+    """
+    doc = BaseDocTemplate(output, pagesize=A4, leftMargin=MARGIN, rightMargin=MARGIN,
+                          topMargin=MARGIN + 1.5 * cm, bottomMargin=MARGIN, pageCompression=1,
+                          title="GreenPrint Monthly History")
+    frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id="body")
+    doc.addPageTemplates([PageTemplate(id="history", frames=[frame], onPage=_draw_page_frame)])
+    doc.build(LazyFlowables(history_flowables(store, user_id, window=window, limit=months)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a user's monthly history report as PDF.")
+    parser.add_argument("email", help="Email address of the profile")
+    parser.add_argument("output", help="Destination PDF file")
+    parser.add_argument("--db", default=str(DEFAULT_PATH), help="History database")
+    args = parser.parse_args(argv)
+    write_history_report(HistoryStore(args.db), user_key({"email": args.email}), args.output)
+
+
+if __name__ == "__main__":
+    main()
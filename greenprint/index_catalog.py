@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""SQLite catalog of the chunks in ``vector_index``; the commit point of ingestion.
+
+The data files are append-only: ingestion adds chunks to a JSON-lines
+docstore log, rows to the end of ``embeddings.npy`` and a new BM25 segment
+file, and nothing already written is rewritten. The catalog holds one row per
+embedding row (node id, content hash, ``deleted`` tombstone), one row per
+(source file, content hash) pair saying which chunk carries that text for
+that file, and a manifest naming the files of the index and how much of the
+log is committed. Readers take a ``snapshot`` and read the files only up to what it
+lists, so an ingestion becomes visible in full when its catalog transaction
+commits, and not before.
+
+A text that appears in several files is embedded once and referenced by each
+of them. A chunk is tombstoned only when no file references it any more, and
+keeps its embedding row until ``compact`` rewrites the index without it.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from collections import namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+
+CATALOG_FILE = "catalog.sqlite3"
+DOCSTORE_FILE = "docstore.json"
+DOCSTORE_LOG_FILE = "docstore_log.jsonl"
+EMBEDDINGS_FILE = "embeddings.npy"
+BM25_FILE = "bm25.npz"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    row INTEGER PRIMARY KEY,
+    node_id TEXT NOT NULL UNIQUE,
+    ref_doc_id TEXT,
+    content_hash TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS chunks_hash ON chunks (content_hash);
+CREATE TABLE IF NOT EXISTS chunk_sources (
+    source TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    PRIMARY KEY (source, content_hash)
+);
+CREATE INDEX IF NOT EXISTS chunk_sources_row ON chunk_sources (row);
+CREATE TABLE IF NOT EXISTS manifest (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# ``docstore_log_bytes`` is the committed length of the log, ``bm25`` lists segment files and
+# ``retired`` the files of the previous generation, deleted by the next compaction. ``unit_rows``
+# says that the embedding rows are L2-normalised
+DEFAULT_MANIFEST = {"docstore": DOCSTORE_FILE, "docstore_log": DOCSTORE_LOG_FILE, "docstore_log_bytes": 0,
+                    "embeddings": EMBEDDINGS_FILE, "unit_rows": False, "bm25": [], "generation": 0, "retired": []}
+
+# ``node_ids[row]`` is None for deleted rows; ``deleted_ids`` are their node ids
+Snapshot = namedtuple("Snapshot", ["node_ids", "ref_doc_ids", "deleted_ids", "manifest"])
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def catalog_path(persist_dir):
+    return Path(persist_dir) / CATALOG_FILE
+
+
+def connect(persist_dir):
+    """Connection in autocommit mode; transactions are opened explicitly."""
+    path = catalog_path(persist_dir)
+    if not path.exists():
+        raise FileNotFoundError(f"No {CATALOG_FILE} in '{persist_dir}'; "
+                                f"run `python -m greenprint.vector_store {persist_dir}` first.")
+    return sqlite3.connect(str(path), timeout=30, isolation_level=None)
+
+
+def version(persist_dir):
+    """Changes with every committed write to the catalog (rollback-journal mode rewrites the file)."""
+    try:
+        stat = catalog_path(persist_dir).stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def snapshot(persist_dir):
+    """Chunk rows and manifest as of one committed transaction."""
+    conn = connect(persist_dir)
+    try:
+        conn.execute("BEGIN")
+        rows = conn.execute("SELECT row, node_id, ref_doc_id, deleted FROM chunks ORDER BY row").fetchall()
+        manifest = read_manifest(conn)
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    if rows and rows[-1][0] != len(rows) - 1:
+        raise ValueError(f"Catalog rows in '{persist_dir}' are not contiguous.")
+    node_ids = [None if deleted else node_id for _, node_id, _, deleted in rows]
+    deleted_ids = frozenset(node_id for _, node_id, _, deleted in rows if deleted)
+    return Snapshot(node_ids, [ref_doc_id for _, _, ref_doc_id, _ in rows], deleted_ids, manifest)
+
+
+def read_manifest(conn):
+    manifest = dict(DEFAULT_MANIFEST)
+    manifest.update((key, json.loads(value)) for key, value in conn.execute("SELECT key, value FROM manifest"))
+    return manifest
+
+
+def write_manifest(conn, manifest):
+    conn.executemany("INSERT OR REPLACE INTO manifest VALUES (?, ?)",
+                     [(key, json.dumps(value)) for key, value in manifest.items()])
+
+
+@contextmanager
+def writing(conn):
+    """Write transaction; ``BEGIN IMMEDIATE`` makes concurrent ingestions wait for each other."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def row_count(conn):
+    return conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM chunks").fetchone()[0]
+
+
+def live_rows(conn, hashes):
+    """``{content_hash: row}`` of the live chunks holding any of ``hashes``."""
+    found = {}
+    hashes = list(hashes)
+    for start in range(0, len(hashes), 500):
+        batch = hashes[start:start + 500]
+        found.update(conn.execute(
+            f"SELECT content_hash, MIN(row) FROM chunks WHERE deleted = 0 AND content_hash IN "
+            f"({', '.join('?' * len(batch))}) GROUP BY content_hash", batch))
+    return found
+
+
+def source_refs(conn, source):
+    """``{content_hash: row}`` of the chunks that ``source`` references."""
+    return dict(conn.execute("SELECT content_hash, row FROM chunk_sources WHERE source = ?", (source,)))
+
+
+def add_refs(conn, refs):
+    """Record ``(source, content_hash, row)`` references, replacing a source's earlier row for a hash."""
+    conn.executemany("INSERT OR REPLACE INTO chunk_sources VALUES (?, ?, ?)", refs)
+
+
+def drop_refs(conn, source, hashes):
+    conn.executemany("DELETE FROM chunk_sources WHERE source = ? AND content_hash = ?",
+                     [(source, digest) for digest in hashes])
+
+
+def delete_unreferenced(conn, rows):
+    """Tombstone those of ``rows`` that no source references any more; returns them."""
+    dead = sorted(row for row in set(rows)
+                  if conn.execute("SELECT 1 FROM chunk_sources WHERE row = ? LIMIT 1", (row,)).fetchone() is None)
+    conn.executemany("UPDATE chunks SET deleted = 1 WHERE row = ?", [(row,) for row in dead])
+    return dead
+
+
+def add_chunks(conn, first_row, nodes, ref_doc_ids=None, with_refs=True):
+    """Catalog rows for ``nodes`` (llama-index nodes), numbered from ``first_row``.
+
+    With ``with_refs``, each node's source file is recorded as referencing it.
+    """
+    if ref_doc_ids is None:
+        ref_doc_ids = [node.ref_doc_id for node in nodes]
+    conn.executemany("INSERT INTO chunks (row, node_id, ref_doc_id, content_hash) VALUES (?, ?, ?, ?)",
+                     [(first_row + i, node.node_id, ref_doc_id, hash_of(node))
+                      for i, (node, ref_doc_id) in enumerate(zip(nodes, ref_doc_ids))])
+    if with_refs:
+        conn.executemany("INSERT OR IGNORE INTO chunk_sources VALUES (?, ?, ?)",
+                         [(source_of(node), hash_of(node), first_row + i) for i, node in enumerate(nodes)
+                          if source_of(node) is not None])
+
+
+def renumber_chunks(conn, nodes, old_rows, ref_doc_ids=None):
+    """Replace every chunk row by ``nodes``, which held rows ``old_rows``; references follow them."""
+    new_row = {old: new for new, old in enumerate(old_rows)}
+    refs = conn.execute("SELECT source, content_hash, row FROM chunk_sources").fetchall()
+    conn.execute("DELETE FROM chunks")
+    conn.execute("DELETE FROM chunk_sources")
+    add_chunks(conn, 0, nodes, ref_doc_ids, with_refs=False)
+    add_refs(conn, [(source, digest, new_row[row]) for source, digest, row in refs if row in new_row])
+
+
+def create(persist_dir, nodes, ref_doc_ids, manifest):
+    """New catalog for ``nodes`` in embedding-row order (replaces any existing one)."""
+    path = catalog_path(persist_dir)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.unlink(missing_ok=True)
+    conn = sqlite3.connect(str(tmp), isolation_level=None)
+    try:
+        conn.executescript(_SCHEMA)
+        with writing(conn):
+            add_chunks(conn, 0, nodes, ref_doc_ids)
+            write_manifest(conn, dict(DEFAULT_MANIFEST, **manifest))
+    finally:
+        conn.close()
+    tmp.chmod(0o644)
+    tmp.replace(path)
+
+
+def hash_of(node):
+    return node.metadata.get("content_hash") or content_hash(node.get_content())
+
+
+def source_of(node):
+    """Resolved path of the file a chunk was read from; re-ingesting that file replaces its chunks."""
+    path = node.metadata.get("file_path") or node.metadata.get("file_name")
+    return str(Path(path).resolve()) if path else None
+
+
+# --- Docstore log ---
+
+def load_docstore(persist_dir, snap=None):
+    """``SimpleDocumentStore`` of the committed chunks: base file, then log, minus tombstones."""
+    from llama_index.core.storage.docstore import SimpleDocumentStore
+    from llama_index.core.storage.docstore.utils import json_to_doc
+
+    persist_dir = Path(persist_dir)
+    snap = snap or snapshot(persist_dir)
+    manifest = snap.manifest
+    docstore = SimpleDocumentStore.from_persist_path(str(persist_dir / manifest["docstore"]))
+    if manifest["docstore_log_bytes"]:
+        with open(persist_dir / manifest["docstore_log"], "rb") as f:
+            log = f.read(manifest["docstore_log_bytes"])
+        docstore.add_documents([json_to_doc(json.loads(line)) for line in log.splitlines()], allow_update=True)
+    for node_id in snap.deleted_ids:
+        docstore.delete_document(node_id, raise_error=False)
+    return docstore
+
+
+def append_docstore_log(persist_dir, manifest, nodes):
+    """Append ``nodes`` after the committed end of the log; returns the new committed length.
+
+    Anything past the committed length is left over from an ingestion that
+    never committed and is overwritten.
+    """
+    from llama_index.core.storage.docstore.utils import doc_to_json
+
+    path = Path(persist_dir) / manifest["docstore_log"]
+    data = b"".join(json.dumps(doc_to_json(node)).encode("utf-8") + b"\n" for node in nodes)
+    with open(path, "r+b" if path.exists() else "wb") as f:
+        f.truncate(manifest["docstore_log_bytes"])
+        f.seek(manifest["docstore_log_bytes"])
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return manifest["docstore_log_bytes"] + len(data)
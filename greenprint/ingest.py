@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""Incremental ingestion of documents into ``vector_index``.
+
+New files are read and split into chunks. Chunks whose text is already in the
+index are skipped (matched by sha256 content hash in the index catalog), and
+only the remaining chunks are embedded, in batches. Nothing already stored is
+read or rewritten: the new chunks are appended to the docstore log, their
+embeddings to the end of ``embeddings.npy`` and their terms to a new BM25
+segment, and the catalog transaction that records them commits last.
+Readers see the whole ingestion once it commits and none of it before
+(greenprint.index_catalog). Adding a document costs time for that document
+only, however large the index.
+
+Files are identified by their resolved path. Re-ingesting a changed file
+replaces it: it stops referencing the texts it no longer contains, and chunks
+that no file references any more are marked deleted in the same transaction.
+``--compact`` rewrites the index without the deleted chunks.
+
+Usage::
+
+    python -m greenprint.ingest docs/new_report.pdf --persist-dir vector_index
+    python -m greenprint.ingest --compact --persist-dir vector_index
+"""
+import argparse
+from pathlib import Path
+
+from greenprint import index_catalog
+from greenprint.index_catalog import content_hash, hash_of, source_of
+from greenprint.lexical import build_segment, save_segment
+from greenprint.vector_store import MmapVectorStore, append_rows, write_matrix
+
+BATCH_SIZE = 32
+
+
+def read_chunks(paths, splitter=None):
+    """Chunks of ``paths`` with their ``content_hash`` set; texts repeated within a file are kept once."""
+    from llama_index.core import SimpleDirectoryReader
+    from llama_index.core.node_parser import SentenceSplitter
+
+    splitter = splitter or SentenceSplitter()
+    documents = SimpleDirectoryReader(input_files=[str(path) for path in paths]).load_data()
+    seen = set()
+    chunks = []
+    for node in splitter.get_nodes_from_documents(documents):
+        digest = content_hash(node.get_content())
+        if (source_of(node), digest) not in seen:
+            seen.add((source_of(node), digest))
+            node.metadata["content_hash"] = digest
+            node.excluded_embed_metadata_keys.append("content_hash")
+            node.excluded_llm_metadata_keys.append("content_hash")
+            chunks.append(node)
+    return chunks
+
+
+def embed_chunks(chunks, embed_model, batch_size=BATCH_SIZE):
+    """Set ``chunk.embedding`` for every chunk, ``batch_size`` texts per model call."""
+    from llama_index.core.schema import MetadataMode
+
+    for start in range(0, len(chunks), batch_size):
+        batch = chunks[start:start + batch_size]
+        texts = [chunk.get_content(metadata_mode=MetadataMode.EMBED) for chunk in batch]
+        for chunk, embedding in zip(batch, embed_model.get_text_embedding_batch(texts)):
+            chunk.embedding = embedding
+
+
+def ingest(paths, persist_dir, embed_model, batch_size=BATCH_SIZE, splitter=None, progress=print):
+    """Add the chunks of ``paths`` to the index in ``persist_dir``; returns the number embedded.
+
+    A text already in the index is not embedded again; the file just
+    references the stored chunk. Texts that a re-ingested file no longer
+    contains lose that file's reference, and chunks left without any
+    reference are deleted.
+    """
+    persist_dir = Path(persist_dir)
+    chunks = read_chunks(paths, splitter)
+    hashes_by_source = {}
+    for chunk in chunks:
+        hashes_by_source.setdefault(source_of(chunk), set()).add(hash_of(chunk))
+
+    conn = index_catalog.connect(persist_dir)
+    try:
+        with index_catalog.writing(conn):
+            rows = index_catalog.live_rows(conn, {hash_of(chunk) for chunk in chunks})
+            added = []
+            for chunk in chunks:
+                if hash_of(chunk) not in rows:
+                    rows[hash_of(chunk)] = None
+                    added.append(chunk)
+            old_refs = {source: index_catalog.source_refs(conn, source) for source in hashes_by_source}
+            dropped = {source: {digest: row for digest, row in refs.items() if digest not in hashes_by_source[source]}
+                       for source, refs in old_refs.items()}
+            unchanged = all(hashes == set(old_refs[source]) for source, hashes in hashes_by_source.items())
+            progress(f"{len(added)} new chunk(s) to embed")
+            if not added and unchanged:
+                return 0
+            embed_chunks(added, embed_model, batch_size)
+
+            manifest = index_catalog.read_manifest(conn)
+            if added:
+                first_row = index_catalog.row_count(conn)
+                rows.update((hash_of(chunk), first_row + i) for i, chunk in enumerate(added))
+                manifest["docstore_log_bytes"] = index_catalog.append_docstore_log(persist_dir, manifest, added)
+                segment = f"bm25-{manifest['generation']}-{first_row}.npz"
+                save_segment(persist_dir / segment, build_segment([chunk.node_id for chunk in added],
+                                                                  [chunk.get_content() for chunk in added]))
+                manifest["bm25"] = manifest["bm25"] + [segment]
+                append_rows(persist_dir / manifest["embeddings"], first_row, [chunk.embedding for chunk in added])
+                index_catalog.add_chunks(conn, first_row, added, with_refs=False)
+            index_catalog.add_refs(conn, [(source, digest, rows[digest])
+                                          for source, hashes in hashes_by_source.items() for digest in hashes])
+            for source, refs in dropped.items():
+                index_catalog.drop_refs(conn, source, refs)
+            # Rows that lost a reference: texts dropped from a file, or re-pointed at another copy
+            released = [row for refs in dropped.values() for row in refs.values()]
+            released += [row for source, refs in old_refs.items() for digest, row in refs.items()
+                         if digest in hashes_by_source[source] and rows[digest] != row]
+            removed = index_catalog.delete_unreferenced(conn, released)
+            index_catalog.write_manifest(conn, manifest)
+    finally:
+        conn.close()
+    progress(f"Added {len(added)} and removed {len(removed)} chunk(s) in {persist_dir}")
+    return len(added)
+
+
+def index_files(generation):
+    """File names of one generation of the index; generation 0 keeps the original names."""
+    names = {"docstore": index_catalog.DOCSTORE_FILE, "docstore_log": index_catalog.DOCSTORE_LOG_FILE,
+             "embeddings": index_catalog.EMBEDDINGS_FILE, "bm25": index_catalog.BM25_FILE}
+    if generation:
+        names = {key: f"{Path(name).stem}-{generation}{Path(name).suffix}" for key, name in names.items()}
+    return names
+
+
+def write_index_files(persist_dir, nodes, embeddings, docstore=None, dtype="float32", generation=0):
+    """Write the base files for ``nodes`` (in embedding-row order); returns the manifest to commit.
+
+    ``docstore=None`` keeps the docstore file that is already there.
+    """
+    persist_dir = Path(persist_dir)
+    names = index_files(generation)
+    if docstore is not None:
+        docstore.persist(str(persist_dir / names["docstore"]))
+    (persist_dir / names["docstore_log"]).unlink(missing_ok=True)
+    write_matrix(persist_dir / names["embeddings"], embeddings, dtype)
+    save_segment(persist_dir / names["bm25"],
+                 build_segment([node.node_id for node in nodes], [node.get_content() for node in nodes]))
+    return dict(names, bm25=[names["bm25"]], docstore_log_bytes=0, unit_rows=True, generation=generation,
+                retired=[])
+
+
+def compact(persist_dir, progress=print):
+    """Rewrite the index without deleted chunks, as a new generation of files.
+
+    The previous generation's files are removed by the next compaction, so
+    readers that loaded them just before this one commits can still finish.
+    """
+    persist_dir = Path(persist_dir)
+    conn = index_catalog.connect(persist_dir)
+    try:
+        with index_catalog.writing(conn):
+            snapshot = index_catalog.snapshot(persist_dir)
+            old = snapshot.manifest
+            store = MmapVectorStore.load(persist_dir, snapshot=snapshot)
+            docstore = index_catalog.load_docstore(persist_dir, snapshot)
+            rows = [row for row, node_id in enumerate(store.ids) if node_id is not None]
+            nodes = docstore.get_nodes([store.ids[row] for row in rows])
+            manifest = write_index_files(persist_dir, nodes, store.embeddings[rows], docstore,
+                                         dtype=str(store.embeddings.dtype), generation=old["generation"] + 1)
+            manifest["retired"] = [old["docstore"], old["docstore_log"], old["embeddings"]] + old["bm25"]
+            index_catalog.renumber_chunks(conn, nodes, rows, [store.ref_doc_ids[row] for row in rows])
+            index_catalog.write_manifest(conn, manifest)
+    finally:
+        conn.close()
+    for name in old["retired"]:
+        (persist_dir / name).unlink(missing_ok=True)
+    progress(f"Compacted {persist_dir}: kept {len(rows)} of {len(store.ids)} chunk(s)")
+    return len(rows)
+
+
+def main(argv=None):
+    from greenprint.rag import PERSIST_DIR, get_embed_model
+
+    parser = argparse.ArgumentParser(description="Add documents to the chatbot's vector index.")
+    parser.add_argument("paths", nargs="*", help="Files to ingest (PDF, text, markdown, ...)")
+    parser.add_argument("--persist-dir", default=str(PERSIST_DIR))
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--compact", action="store_true", help="Rewrite the index without deleted chunks")
+    args = parser.parse_args(argv)
+    if not args.paths and not args.compact:
+        parser.error("give files to ingest, --compact, or both")
+    if args.paths:
+        ingest(args.paths, args.persist_dir, get_embed_model(), batch_size=args.batch_size)
+    if args.compact:
+        compact(args.persist_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""BM25 inverted index over the chunk texts of ``vector_index``.
+
+The index is stored as segments: ``bm25.npz`` for the chunks of the base
+docstore, plus one segment per ingestion (greenprint.ingest), listed in the
+index catalog. A segment keeps raw term frequencies and document lengths,
+CSR-style (per-term offsets into one array of document numbers), so adding
+documents writes a segment for them alone. ``BM25Index.load`` merges the
+segments, drops deleted chunks and precomputes the BM25 impact weight of
+every posting with the collection-wide idf; a query is then a few array
+slices summed into a score vector. ``reciprocal_rank_fusion`` merges its
+ranking with the dense one.
+"""
+import os
+import re
+from collections import Counter, namedtuple
+from pathlib import Path
+
+import numpy as np
+
+from greenprint import index_catalog
+from greenprint.retrieval import top_k
+
+BM25_FILE = index_catalog.BM25_FILE
+K1 = 1.2
+B = 0.75
+RRF_K = 60
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:_[a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or that the their this to was "
+    "were what when which who why will with you your".split())
+
+
+def tokenize(text):
+    """Lower-case terms; ``Hotel_stay`` yields ``hotel_stay``, ``hotel`` and ``stay``."""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        if "_" in token:
+            tokens.extend(part for part in token.split("_") if part not in _STOPWORDS)
+    return tokens
+
+
+# Postings of ``vocabulary[t]`` are ``docs[offsets[t]:offsets[t + 1]]`` with term frequencies ``tfs``
+Segment = namedtuple("Segment", ["node_ids", "vocabulary", "offsets", "docs", "tfs", "lengths"])
+
+
+def build_segment(node_ids, texts):
+    counts = [Counter(tokenize(text)) for text in texts]
+    vocabulary = sorted(set().union(*counts)) if counts else []
+    term_ids = {term: i for i, term in enumerate(vocabulary)}
+    terms, docs, tfs = [], [], []
+    for doc, counter in enumerate(counts):
+        for term, tf in counter.items():
+            terms.append(term_ids[term])
+            docs.append(doc)
+            tfs.append(tf)
+    terms = np.array(terms, dtype=np.int64)
+    order = np.argsort(terms, kind="stable")
+    offsets = np.searchsorted(terms[order], np.arange(len(vocabulary) + 1)).astype(np.int64)
+    return Segment(list(node_ids), vocabulary, offsets, np.array(docs, dtype=np.int32)[order],
+                   np.array(tfs, dtype=np.float32)[order],
+                   np.array([sum(c.values()) for c in counts], dtype=np.float32))
+
+
+def save_segment(path, segment):
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, node_ids=np.array(segment.node_ids, dtype=str),
+                            vocabulary=np.array(segment.vocabulary, dtype=str), offsets=segment.offsets,
+                            docs=segment.docs, tfs=segment.tfs, lengths=segment.lengths)
+        f.flush()
+        os.fsync(f.fileno())
+    tmp.chmod(0o644)
+    tmp.replace(path)
+
+
+def load_segment(path):
+    with np.load(path, allow_pickle=False) as data:
+        return Segment(data["node_ids"].tolist(), data["vocabulary"].tolist(), data["offsets"], data["docs"],
+                       data["tfs"], data["lengths"])
+
+
+class BM25Index:
+    """Read-only BM25 index; build with ``from_texts`` or ``from_segments``, or ``load`` a saved one."""
+
+    def __init__(self, node_ids, vocabulary, offsets, postings, weights):
+        self.node_ids = list(node_ids)
+        self.term_ids = {term: i for i, term in enumerate(vocabulary)}
+        self.offsets = offsets
+        self.postings = postings
+        self.weights = weights
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    @classmethod
+    def from_texts(cls, node_ids, texts, k1=K1, b=B):
+        return cls.from_segments([build_segment(node_ids, texts)], k1=k1, b=b)
+
+    @classmethod
+    def from_segments(cls, segments, deleted_ids=(), k1=K1, b=B):
+        """Merge ``segments`` into one index; chunks in ``deleted_ids`` get no postings."""
+        node_ids, term_ids = [], {}
+        terms, docs, tfs, lengths = [], [], [], []
+        for segment in segments:
+            global_terms = np.array([term_ids.setdefault(term, len(term_ids)) for term in segment.vocabulary],
+                                    dtype=np.int64)
+            terms.append(np.repeat(global_terms, np.diff(segment.offsets)))
+            docs.append(segment.docs.astype(np.int64) + len(node_ids))
+            tfs.append(segment.tfs)
+            lengths.append(segment.lengths)
+            node_ids += segment.node_ids
+        terms, docs, tfs, lengths = (np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+                                     for parts, dtype in ((terms, np.int64), (docs, np.int64),
+                                                          (tfs, np.float32), (lengths, np.float32)))
+        live = np.array([node_id not in deleted_ids for node_id in node_ids], dtype=bool)
+        keep = live[docs]
+        terms, docs, tfs = terms[keep], docs[keep], tfs[keep]
+        order = np.argsort(terms, kind="stable")
+        terms, docs, tfs = terms[order], docs[order].astype(np.int32), tfs[order]
+
+        n_docs = int(live.sum())
+        df = np.bincount(terms, minlength=len(term_ids)).astype(np.float32)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        norm = k1 * (1 - b + b * lengths / max(float(lengths[live].mean()) if n_docs else 0.0, 1e-9))
+        weights = (idf[terms] * tfs * (k1 + 1) / (tfs + norm[docs])).astype(np.float32)
+        offsets = np.searchsorted(terms, np.arange(len(term_ids) + 1)).astype(np.int64)
+        return cls(node_ids, list(term_ids), offsets, docs, weights)
+
+    @classmethod
+    def load(cls, persist_dir, snapshot=None):
+        """Merge the segments listed in the catalog ``snapshot`` (default: its current state)."""
+        snapshot = snapshot or index_catalog.snapshot(persist_dir)
+        segments = [load_segment(Path(persist_dir) / name) for name in snapshot.manifest["bm25"]]
+        return cls.from_segments(segments, snapshot.deleted_ids)
+
+    def search(self, query, k):
+        """``[(node_id, score)]`` of the best ``k`` nodes sharing a term with ``query``."""
+        scores = np.zeros(len(self.node_ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is not None:
+                start, stop = self.offsets[term_id], self.offsets[term_id + 1]
+                scores[self.postings[start:stop]] += self.weights[start:stop]
+        return [(self.node_ids[row], float(scores[row])) for row in top_k(scores, k) if scores[row] > 0]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuse ranked id lists: each id scores ``sum(1 / (k + rank))``; returns ``[(id, score)]``, best first."""
+    scores = {}
+    for ranking in rankings:
+        for rank, node_id in enumerate(ranking, start=1):
+            scores[node_id] = scores.get(node_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""llama-index retriever backed by greenprint.retrieval.
+
+Plugs the NumPy search index into chat engines in place of
+``VectorStoreIndex.as_retriever``: the query is embedded once, scored against
+the whole embedding matrix, and the winning nodes are read from the docstore.
+With a BM25 index (greenprint.lexical) the lexical lookup runs on a worker
+thread while the query is embedded and scored, and the two rankings are
+merged with reciprocal-rank fusion.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore
+
+from greenprint.lexical import reciprocal_rank_fusion
+
+# Candidates taken from each ranking before fusion, per requested result
+FUSION_DEPTH = 5
+
+_lexical_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="greenprint-bm25")
+
+
+class MatrixRetriever(BaseRetriever):
+    """Top-k retriever over a ``greenprint.retrieval`` index.
+
+    ``node_ids`` maps index rows to docstore node ids (the row order of the
+    binary vector store, None for deleted rows, which are skipped). With a ``query_cache`` (greenprint.embedding_cache),
+    repeated questions skip the embedding model; ``record_cache_hits=False``
+    is for callers that already looked the question up (and counted it) before
+    chatting. With a ``lexical_index``, results are fused dense + BM25 and
+    scored by reciprocal rank.
+    """
+
+    def __init__(self, search_index, node_ids, docstore, embed_model, similarity_top_k=2, query_cache=None,
+                 lexical_index=None, record_cache_hits=True, **kwargs):
+        super().__init__(**kwargs)
+        self._search_index = search_index
+        self._node_ids = node_ids
+        self._docstore = docstore
+        self._embed_model = embed_model
+        self._similarity_top_k = similarity_top_k
+        self._query_cache = query_cache
+        self._lexical_index = lexical_index
+        self._record_cache_hits = record_cache_hits
+
+    def _dense(self, query_bundle, k):
+        query_embedding = query_bundle.embedding
+        if query_embedding is None and self._query_cache is not None:
+            query_embedding = self._query_cache.get_or_compute(query_bundle.query_str,
+                                                               self._embed_model.get_query_embedding,
+                                                               record_hit=self._record_cache_hits)
+        elif query_embedding is None:
+            query_embedding = self._embed_model.get_query_embedding(query_bundle.query_str)
+        # Deleted rows stay in the index until it is compacted; search deeper until k live rows turn up
+        fetch = k
+        while True:
+            rows, scores = self._search_index.search(query_embedding, fetch)
+            hits = [(self._node_ids[row], float(score)) for row, score in zip(rows, scores)
+                    if self._node_ids[row] is not None]
+            if len(hits) >= k or fetch >= len(self._node_ids):
+                return hits[:k]
+            fetch = min(fetch * 2, len(self._node_ids))
+
+    def _retrieve(self, query_bundle):
+        if self._lexical_index is None:
+            hits = self._dense(query_bundle, self._similarity_top_k)
+        else:
+            depth = self._similarity_top_k * FUSION_DEPTH
+            lexical = _lexical_executor.submit(self._lexical_index.search, query_bundle.query_str, depth)
+            dense = self._dense(query_bundle, depth)
+            fused = reciprocal_rank_fusion([[node_id for node_id, _ in dense],
+                                            [node_id for node_id, _ in lexical.result()]])
+            hits = fused[:self._similarity_top_k]
+        nodes = self._docstore.get_nodes([node_id for node_id, _ in hits], raise_error=False)
+        return [NodeWithScore(node=node, score=score) for node, (_, score) in zip(nodes, hits) if node is not None]
@@ -0,0 +1,425 @@
+# -*- coding: utf-8 -*-
+"""Asyncio gateway in front of the chat LLM.
+
+Requests are chat message lists (``[{"role": ..., "content": ...}]``). Every
+request goes through one ``LLMGateway`` per process:
+
+- it has its own event loop on a daemon thread, so Streamlit script threads
+  only block on their own request;
+- a semaphore caps concurrent upstream calls;
+- every request has a deadline covering queueing, all attempts and backoff;
+- transient failures are retried with exponential backoff and jitter;
+- identical requests already in flight share a single upstream call. This
+  holds for streams too: every caller receives all the tokens, and a caller
+  that joins late first gets the ones it missed.
+
+Backends are pluggable. ``HuggingFaceBackend`` wraps one
+``huggingface_hub.InferenceClient``, whose HTTP session is reused across
+requests, and uses its chat-completion endpoint, so the model's own chat
+template and stop tokens are applied on the server. ``LocalBackend`` is an offline stand-in with configurable latency,
+used for development and load tests. ``GREENPRINT_LLM_BACKEND=local``
+selects it.
+
+Load test::
+
+    python -m greenprint.llm_gateway --requests 500 --distinct 25 --concurrency 8
+"""
+import argparse
+import asyncio
+import functools
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND = os.environ.get("GREENPRINT_LLM_BACKEND", "huggingface")
+MAX_CONCURRENCY = 4
+TIMEOUT_SECONDS = 60.0
+RETRIES = 2
+BACKOFF_SECONDS = 0.5
+
+
+class GatewayTimeout(TimeoutError):
+    """The request missed its deadline (queueing and retries included)."""
+
+
+# --- Backends ---
+class LocalBackend:
+    """Offline stand-in: answers after ``latency`` seconds at ``tokens_per_second``."""
+
+    name = "local"
+
+    def __init__(self, latency=0.2, tokens_per_second=80.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def _tokens(self, messages):
+        question = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        words = f"(local stand-in) You asked: {question.strip()[:200]}".split()
+        return [word + " " for word in words]
+
+    async def generate(self, messages, **params):
+        return "".join([token async for token in self.stream(messages, **params)])
+
+    async def stream(self, messages, **params):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self._random.random() < self.failure_rate:
+            raise ConnectionError("Simulated upstream failure")
+        for token in self._tokens(messages):
+            await asyncio.sleep(1.0 / self.tokens_per_second)
+            yield token
+
+
+class HuggingFaceBackend:
+    """Hugging Face Inference API through a single shared ``InferenceClient``.
+
+    Requests go to ``chat_completion``, so the server formats the messages with
+    the model's chat template (``[INST]`` blocks for Mistral) and stops at its
+    end-of-turn token. The client is synchronous, so calls run on a small
+    thread pool sized to the gateway's concurrency limit.
+    """
+
+    name = "huggingface"
+
+    def __init__(self, model, token=None, timeout=TIMEOUT_SECONDS, max_workers=MAX_CONCURRENCY):
+        from huggingface_hub import InferenceClient
+        self.client = InferenceClient(model=model, token=token, timeout=timeout)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="greenprint-hf")
+
+    async def generate(self, messages, **params):
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            self._executor, functools.partial(self.client.chat_completion, messages, **params))
+        return response.choices[0].message.content or ""
+
+    async def stream(self, messages, **params):
+        """Tokens read on an executor thread; the thread stops reading once this generator is closed."""
+        loop = asyncio.get_running_loop()
+        tokens = asyncio.Queue()
+        done = object()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                chunks = self.client.chat_completion(messages, stream=True, **params)
+                try:
+                    for chunk in chunks:
+                        if stop.is_set():
+                            return
+                        token = chunk.choices[0].delta.content if chunk.choices else None
+                        if token:
+                            loop.call_soon_threadsafe(tokens.put_nowait, token)
+                finally:
+                    if hasattr(chunks, "close"):
+                        chunks.close()
+                loop.call_soon_threadsafe(tokens.put_nowait, done)
+            except Exception as e:
+                if not stop.is_set():
+                    loop.call_soon_threadsafe(tokens.put_nowait, e)
+
+        producer = loop.run_in_executor(self._executor, produce)
+        try:
+            while (token := await tokens.get()) is not done:
+                if isinstance(token, Exception):
+                    raise token
+                yield token
+        finally:
+            # The caller's semaphore slot is held until the thread has really let go of the response
+            stop.set()
+            await asyncio.wait([producer])
+
+
+def _transient_errors():
+    """Connection and timeout errors of the HTTP stacks ``InferenceClient`` may run on."""
+    errors = [ConnectionError, asyncio.TimeoutError, TimeoutError]
+    try:
+        import requests
+        errors += [requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError]
+    except ImportError:
+        pass
+    try:
+        import httpx
+        errors += [httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError]
+    except ImportError:
+        pass
+    try:
+        from huggingface_hub.errors import InferenceTimeoutError
+        errors.append(InferenceTimeoutError)
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+_TRANSIENT_ERRORS = _transient_errors()
+
+
+def _is_transient(error):
+    if isinstance(error, _TRANSIENT_ERRORS):
+        return True
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status in (429, 500, 502, 503, 504)
+
+
+class _Broadcast:
+    """Tokens of one upstream stream, replayed in full to every subscriber."""
+
+    def __init__(self):
+        self.tokens = []
+        self.error = None
+        self.done = False
+        self.subscribers = 0
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def push(self, token):
+        self.tokens.append(token)
+        self._notify()
+
+    def finish(self, error=None):
+        self.error = error
+        self.done = True
+        self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self):
+        position = 0
+        while True:
+            if position < len(self.tokens):
+                position += 1
+                yield self.tokens[position - 1]
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await self._changed.wait()
+
+
+# --- Gateway ---
+class LLMGateway:
+    """Bounded, deadline-aware, coalescing front for one backend."""
+
+    def __init__(self, backend, max_concurrency=MAX_CONCURRENCY, timeout=TIMEOUT_SECONDS, retries=RETRIES,
+                 backoff=BACKOFF_SECONDS):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = {"requests": 0, "coalesced": 0, "upstream_calls": 0, "retries": 0, "timeouts": 0,
+                      "failures": 0}
+        self._semaphore = None
+        self._inflight = {}
+        self._streams = {}
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    # Coroutines below run on the gateway loop
+    @staticmethod
+    def _key(messages, params):
+        return tuple((m["role"], m["content"]) for m in messages), tuple(sorted(params.items()))
+
+    async def generate(self, messages, timeout=None, **params):
+        """Completion text for ``messages``; identical in-flight requests share one call."""
+        self.stats["requests"] += 1
+        key = self._key(messages, params)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._generate_with_retries(messages, params))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        try:
+            # shield: one caller missing its deadline must not cancel the shared call
+            return await asyncio.wait_for(asyncio.shield(task), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise GatewayTimeout(f"LLM request exceeded {timeout or self.timeout:g}s") from None
+
+    async def _generate_with_retries(self, messages, params):
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._get_semaphore():
+                    self.stats["upstream_calls"] += 1
+                    return await self.backend.generate(messages, **params)
+            except Exception as e:
+                if attempt == self.retries or not _is_transient(e):
+                    self.stats["failures"] += 1
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+
+    async def stream(self, messages, timeout=None, **params):
+        """Async iterator of tokens; identical in-flight streams share one upstream stream.
+
+        The upstream call is cancelled once every caller has stopped reading.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self.stats["requests"] += 1
+        key = self._key(messages, params)
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = self._streams[key] = _Broadcast()
+            broadcast.task = asyncio.ensure_future(self._stream_with_retries(broadcast, messages, params))
+            broadcast.task.add_done_callback(
+                lambda _: self._streams.pop(key) if self._streams.get(key) is broadcast else None)
+        else:
+            self.stats["coalesced"] += 1
+        broadcast.subscribers += 1
+        tokens = broadcast.subscribe()
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                try:
+                    token = await asyncio.wait_for(tokens.__anext__(), remaining)
+                except StopAsyncIteration:
+                    return
+                yield token
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise GatewayTimeout(f"LLM stream exceeded {timeout or self.timeout:g}s") from None
+        finally:
+            await tokens.aclose()
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done:
+                if self._streams.get(key) is broadcast:
+                    del self._streams[key]
+                broadcast.task.cancel()
+
+    async def _stream_with_retries(self, broadcast, messages, params):
+        """Feed ``broadcast`` from the backend. Retries happen only before the first token arrives."""
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._get_semaphore():
+                    self.stats["upstream_calls"] += 1
+                    async for token in self.backend.stream(messages, **params):
+                        broadcast.push(token)
+                broadcast.finish()
+                return
+            except asyncio.CancelledError:
+                broadcast.finish(GatewayTimeout("LLM stream was cancelled"))
+                raise
+            except Exception as e:
+                if broadcast.tokens or attempt == self.retries or not _is_transient(e):
+                    self.stats["failures"] += 1
+                    broadcast.finish(e)
+                    return
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+
+    def _get_semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    # Blocking entry points for script threads
+    def _ensure_loop(self):
+        with self._start_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="greenprint-llm-gateway",
+                                                daemon=True)
+                self._thread.start()
+        return self._loop
+
+    def complete(self, messages, timeout=None, **params):
+        """Blocking ``generate`` run on the gateway loop."""
+        future = asyncio.run_coroutine_threadsafe(self.generate(messages, timeout=timeout, **params),
+                                                  self._ensure_loop())
+        return future.result()
+
+    def stream_complete(self, messages, timeout=None, **params):
+        """Blocking generator over ``stream``; tokens are handed over through a thread queue.
+
+        Closing the generator before the end cancels the stream on the gateway loop.
+        """
+        tokens = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for token in self.stream(messages, timeout=timeout, **params):
+                    tokens.put(token)
+                tokens.put(done)
+            except BaseException as e:
+                tokens.put(e)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._ensure_loop())
+        try:
+            while (token := tokens.get()) is not done:
+                if isinstance(token, BaseException):
+                    raise token
+                yield token
+        finally:
+            # The caller stopped reading (or the generator was closed): stop the stream on the loop too
+            future.cancel()
+
+
+def create_backend(name=BACKEND, model=None):
+    """Backend by name: ``huggingface`` (needs ``model``) or ``local``."""
+    if name == "local":
+        return LocalBackend()
+    if name == "huggingface":
+        return HuggingFaceBackend(model)
+    raise ValueError(f"Unknown LLM backend '{name}' (expected 'huggingface' or 'local').")
+
+
+# --- Load test ---
+async def load_test(gateway, requests=200, distinct=20, clients=50):
+    """Fire ``requests`` questions (``distinct`` unique ones) from ``clients`` concurrent callers."""
+    questions = [[{"role": "user", "content": f"question {i % distinct}"}] for i in range(requests)]
+    random.shuffle(questions)
+    latencies, errors = [], 0
+    pending = iter(questions)
+
+    async def client():
+        nonlocal errors
+        for messages in pending:
+            start = time.perf_counter()
+            try:
+                await gateway.generate(messages)
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else float("nan")
+    return {"requests": requests, "errors": errors, "seconds": elapsed, "requests_per_s": requests / elapsed,
+            "p50_s": percentile(0.5), "p95_s": percentile(0.95), **gateway.stats}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the LLM gateway against the local stand-in backend.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=20, help="Number of unique questions")
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent callers")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="Gateway concurrency limit")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stand-in latency before the first token")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    backend = LocalBackend(latency=args.latency, failure_rate=args.failure_rate)
+    gateway = LLMGateway(backend, max_concurrency=args.concurrency, backoff=0.05)
+    result = asyncio.run(load_test(gateway, args.requests, args.distinct, args.clients))
+    for key, value in result.items():
+        print(f"{key:>15}: {value:.3f}" if isinstance(value, float) else f"{key:>15}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""Process-wide chatbot resources: embedding model, LLM client, chunks and embeddings.
+
+Each resource is created once per server process and shared by every session
+and every rerun. Resources read from ``vector_index`` are reloaded after an
+ingestion commits. ``start_warm_up`` loads them on a background
+thread so the first chat message does not pay for model loading. llama-index is
+imported lazily, so importing this module costs nothing for pages that do not
+chat.
+"""
+import threading
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PERSIST_DIR = ROOT / "vector_index"
+HF_MODEL = "mistralai/Mistral-7B-Instruct-v0.3"
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-l6-v2"
+
+_resources = {}
+_lock = threading.RLock()
+_warm_up_thread = None
+
+
+def _resource(name, factory, version=None):
+    entry = _resources.get(name)
+    if entry is None or entry[0] != version:
+        with _lock:
+            entry = _resources.get(name)
+            if entry is None or entry[0] != version:
+                entry = (version, factory())
+                _resources[name] = entry
+    return entry[1]
+
+
+def _index_version(persist_dir):
+    """Changes when an ingestion commits to ``persist_dir`` (see greenprint.ingest), so index resources reload."""
+    from greenprint.index_catalog import version
+    return version(persist_dir)
+
+
+def get_gateway():
+    """Async LLM gateway (concurrency limit, deadlines, retries, coalescing).
+
+    ``GREENPRINT_LLM_BACKEND=local`` swaps the Hugging Face Inference API for an
+    offline stand-in.
+    """
+    def create():
+        from greenprint.llm_gateway import BACKEND, LLMGateway, create_backend
+        return LLMGateway(create_backend(BACKEND, HF_MODEL))
+    return _resource("gateway", create)
+
+
+def get_llm():
+    """Chat model client; every call goes through ``get_gateway()``."""
+    def create():
+        from greenprint.gateway_llm import GatewayLLM
+        return GatewayLLM(get_gateway(), model_name=HF_MODEL)
+    return _resource("llm", create)
+
+
+def get_embed_model():
+    """Sentence-transformer embedding model (loaded onto CPU once)."""
+    def create():
+        from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+        return HuggingFaceEmbedding(model_name=EMBEDDING_MODEL)
+    return _resource("embed_model", create)
+
+
+def get_docstore(persist_dir=PERSIST_DIR):
+    """Chunk texts and metadata: ``docstore.json`` plus the chunks ingested since.
+
+    Embeddings are read from the memory-mapped store (``get_vector_store``), so
+    no llama-index vector store JSON is parsed at start-up.
+    """
+    def create():
+        from greenprint.index_catalog import load_docstore
+        if not Path(persist_dir).exists():
+            raise FileNotFoundError(f"Vector index directory '{persist_dir}' not found.")
+        return load_docstore(persist_dir)
+    return _resource(f"docstore:{Path(persist_dir).resolve()}", create, _index_version(persist_dir))
+
+
+def get_vector_store(persist_dir=PERSIST_DIR):
+    """Memory-mapped embedding matrix of ``persist_dir`` (see greenprint.vector_store)."""
+    def create():
+        from greenprint.vector_store import MmapVectorStore
+        return MmapVectorStore.load(persist_dir)
+    return _resource(f"vector_store:{Path(persist_dir).resolve()}", create, _index_version(persist_dir))
+
+
+def get_query_cache():
+    """Query-embedding cache (in-process LRU over a SQLite file shared by all processes)."""
+    def create():
+        from greenprint.embedding_cache import QueryEmbeddingCache
+        return QueryEmbeddingCache(EMBEDDING_MODEL)
+    return _resource("query_cache", create)
+
+
+def embed_query(text):
+    """Embedding of a chat question, served from the query cache when possible."""
+    return get_query_cache().get_or_compute(text, get_embed_model().get_query_embedding)
+
+
+def get_answer_cache(persist_dir=PERSIST_DIR):
+    """Semantic answer cache, emptied whenever the files in ``persist_dir`` change."""
+    def create():
+        from greenprint.answer_cache import SemanticAnswerCache, index_fingerprint
+        return SemanticAnswerCache(get_vector_store(persist_dir).dim, fingerprint=index_fingerprint(persist_dir))
+    return _resource(f"answer_cache:{Path(persist_dir).resolve()}", create, _index_version(persist_dir))
+
+
+def get_search_index(persist_dir=PERSIST_DIR, ann_threshold=None, nprobe=None):
+    """NumPy top-k index over the stored embeddings.
+
+    Exact up to ``ann_threshold`` rows (default ``retrieval.ANN_THRESHOLD``),
+    IVF above it; ``nprobe`` sets the IVF recall.
+    """
+    from greenprint import retrieval
+    ann_threshold = retrieval.ANN_THRESHOLD if ann_threshold is None else ann_threshold
+    nprobe = retrieval.DEFAULT_NPROBE if nprobe is None else nprobe
+
+    def create():
+        store = get_vector_store(persist_dir)
+        return retrieval.build_index(store.embeddings, ann_threshold=ann_threshold, normalized=store.normalized,
+                                     nprobe=nprobe)
+    return _resource(f"search_index:{Path(persist_dir).resolve()}:{ann_threshold}:{nprobe}", create,
+                     _index_version(persist_dir))
+
+
+def get_lexical_index(persist_dir=PERSIST_DIR):
+    """BM25 index merged from the segments listed in the catalog, or None if there are none."""
+    def create():
+        from greenprint.index_catalog import snapshot
+        from greenprint.lexical import BM25Index
+        snap = snapshot(persist_dir)
+        return BM25Index.load(persist_dir, snap) if snap.manifest["bm25"] else None
+    return _resource(f"lexical_index:{Path(persist_dir).resolve()}", create, _index_version(persist_dir))
+
+
+def get_retriever(similarity_top_k=2, persist_dir=PERSIST_DIR, ann_threshold=None, nprobe=None,
+                  record_cache_hits=True):
+    """Dense matrix retriever, fused with BM25 when the index has a BM25 segment.
+
+    Pass ``record_cache_hits=False`` when the question was already embedded
+    through ``embed_query``, so the query cache counts it once.
+    """
+    from greenprint.llama_retriever import MatrixRetriever
+    return MatrixRetriever(get_search_index(persist_dir, ann_threshold, nprobe), get_vector_store(persist_dir).ids,
+                           get_docstore(persist_dir), get_embed_model(),
+                           similarity_top_k=similarity_top_k, query_cache=get_query_cache(),
+                           lexical_index=get_lexical_index(persist_dir), record_cache_hits=record_cache_hits)
+
+
+def warm_up():
+    """Load every resource and run one embedding so model weights are resident."""
+    get_llm()
+    get_embed_model().get_query_embedding("warm up")
+    get_docstore()
+    get_search_index()
+    get_lexical_index()
+
+
+def start_warm_up():
+    """Run ``warm_up`` on a daemon thread (at most once per process); returns the thread."""
+    global _warm_up_thread
+    with _lock:
+        if _warm_up_thread is None:
+            def run():
+                try:
+                    warm_up()
+                except Exception as e:
+                    print(f"Chatbot warm-up failed: {e}")
+            _warm_up_thread = threading.Thread(target=run, name="greenprint-warm-up", daemon=True)
+            _warm_up_thread.start()
+    return _warm_up_thread
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""PDF footprint report rendered with ReportLab."""
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader # To read image data for ReportLab
+from io import BytesIO
+import hashlib
+import json
+import traceback # For detailed error logging
+
+from greenprint.activities import format_activity_name
+from greenprint.report_charts import chart_height, draw_bar_chart
+
+# --- Constants ---
+MARGIN = 1.8 * cm
+CO2_SUB = "CO\u2082" # Unicode for subscript 2 - Ensure your PDF viewer/font supports it
+
+# --- Enhanced PDF Report Generator ---
+# Charts are drawn natively on the canvas unless pre-rendered images are passed in
+def generate_pdf_report(logo_data, category_data, top_activities_data, fig1_img_data=None, fig2_img_data=None,
+                        subtitle=None):
+    buffer = BytesIO()
+    try:
+        c = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+
+        # --- Draw Logo ---
+        logo_height = 0
+        if logo_data:
+            try:
+                logo_img = logo_data if isinstance(logo_data, ImageReader) else ImageReader(logo_data)
+                img_w, img_h = logo_img.getSize()
+                aspect = img_h / float(img_w) if img_w > 0 else 1
+                draw_width = 5.5 * cm # Slightly larger logo
+                draw_height = draw_width * aspect
+                logo_height = draw_height
+                c.drawImage(logo_img, width - MARGIN - draw_width, height - MARGIN - draw_height,
+                            width=draw_width, height=draw_height, preserveAspectRatio=True, mask='auto')
+            except Exception as logo_err:
+                print(f"Error drawing logo: {logo_err}")
+
+        # --- Title ---
+        c.setFont("Helvetica-Bold", 16)
+        title_y = height - MARGIN - (logo_height / 2 if logo_height > 0 else 0) - 0.5 * cm
+        c.drawCentredString(width / 2.0, title_y, "GreenPrint Carbon Footprint Report")
+        if subtitle:
+            c.setFont("Helvetica", 10)
+            c.drawCentredString(width / 2.0, title_y - 0.6 * cm, subtitle)
+        y_pos = title_y - 1.5 * cm # Start below title/logo
+
+        # --- Section 1: Emission by Category (Text) ---
+        c.setFont("Helvetica-Bold", 12)
+        if y_pos < MARGIN + 2*cm: c.showPage(); c.setFont("Helvetica-Bold", 12); y_pos = height - MARGIN # New page if needed
+        c.drawString(MARGIN, y_pos, f"Emission by Category:")
+        c.setFont("Helvetica", 9.5)
+        y_pos -= 0.6 * cm
+
+        if isinstance(category_data, dict) and category_data:
+            for category, emission in category_data.items():
+                if y_pos < MARGIN + 1*cm: c.showPage(); c.setFont("Helvetica", 9.5); y_pos = height - MARGIN
+                emission_val = emission if isinstance(emission, (int, float)) else 0
+                c.drawString(MARGIN + 0.5*cm, y_pos, f"• {category}: {emission_val:.2f} kg {CO2_SUB}") # Use subscript
+                y_pos -= 0.55 * cm
+        else:
+             if y_pos < MARGIN + 1*cm: c.showPage(); c.setFont("Helvetica", 9.5); y_pos = height - MARGIN
+             c.drawString(MARGIN + 0.5*cm, y_pos, "Category data unavailable.")
+             y_pos -= 0.55*cm
+
+        # --- Draw Category Graph (fig1) ---
+        y_pos -= 0.4 * cm # Space before graph
+        if fig1_img_data:
+            try:
+                graph1_img = ImageReader(fig1_img_data)
+                img_w, img_h = graph1_img.getSize()
+                aspect = img_h / float(img_w) if img_w > 0 else 1
+                draw_width = width - (2 * MARGIN)
+                draw_height = draw_width * aspect
+                max_graph_height = 7*cm # Limit height
+                if draw_height > max_graph_height:
+                    draw_height = max_graph_height
+                    draw_width = draw_height / aspect if aspect > 0 else draw_width
+
+                if y_pos - draw_height < MARGIN: # Check if graph fits
+                    c.showPage(); c.setFont("Helvetica", 9.5); y_pos = height - MARGIN # Start new page
+                    y_pos -= 0.3*cm # Space at top
+
+                c.drawImage(graph1_img, MARGIN, y_pos - draw_height,
+                            width=draw_width, height=draw_height, preserveAspectRatio=True, mask='auto')
+                y_pos -= (draw_height + 0.6*cm) # Move below graph
+            except Exception as graph1_err:
+                print(f"Error drawing category graph: {graph1_err}")
+                if y_pos < MARGIN + 1*cm: c.showPage(); c.setFont("Helvetica", 9.5); y_pos = height - MARGIN
+                c.drawString(MARGIN, y_pos, "[Category graph could not be rendered]")
+                y_pos -= 0.6 * cm
+        elif isinstance(category_data, dict) and category_data:
+            draw_height = chart_height(len(category_data))
+            if y_pos - draw_height < MARGIN: # Check if graph fits
+                c.showPage(); c.setFont("Helvetica", 9.5); y_pos = height - MARGIN - 0.3*cm
+            draw_bar_chart(c, MARGIN, y_pos, width - 2 * MARGIN, draw_height, category_data.items(),
+                           palette="Greens", axis_title=f"Emissions (kg {CO2_SUB})")
+            y_pos -= (draw_height + 0.6*cm) # Move below graph
+
+        # --- Section 2: Top Emitting Activities (Text) ---
+        if y_pos < MARGIN + 3*cm : # Check space
+             c.showPage(); y_pos = height - MARGIN
+
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(MARGIN, y_pos, "Top Emitting Activities:")
+        c.setFont("Helvetica", 9.5)
+        y_pos -= 0.6 * cm
+
+        # Handle data format
+        if hasattr(top_activities_data, "iloc"):  # pandas DataFrame
+            top_activities_dict = dict(zip(top_activities_data.iloc[:,0], top_activities_data.iloc[:,1]))
+        elif isinstance(top_activities_data, dict):
+            top_activities_dict = top_activities_data
+        else:
+            top_activities_dict = {}
+
+        if top_activities_dict:
+            for activity_key, emission in top_activities_dict.items():
+                if y_pos < MARGIN + 1*cm:
+                    c.showPage(); c.setFont("Helvetica", 9.5); y_pos = height - MARGIN
+                emission_val = emission if isinstance(emission, (int, float)) else 0
+                display_name = format_activity_name(activity_key)
+                display_name = (display_name[:45] + '...') if len(display_name) > 48 else display_name
+                c.drawString(MARGIN + 0.5*cm, y_pos, f"• {display_name}: {emission_val:.2f} kg {CO2_SUB}") # Use subscript
+                y_pos -= 0.55 * cm
+        else:
+            if y_pos < MARGIN + 1*cm: c.showPage(); c.setFont("Helvetica", 9.5); y_pos = height - MARGIN
+            c.drawString(MARGIN + 0.5*cm, y_pos, "Top activities data unavailable.")
+            y_pos -= 0.55*cm
+
+        # --- Draw Top Activities Graph (fig2) ---
+        y_pos -= 0.4 * cm # Space before graph
+        if fig2_img_data:
+            try:
+                graph2_img = ImageReader(fig2_img_data)
+                img_w, img_h = graph2_img.getSize()
+                aspect = img_h / float(img_w) if img_w > 0 else 1
+                draw_width = width - (2 * MARGIN)
+                draw_height = draw_width * aspect
+                max_graph_height = 7.5*cm # Limit height
+                if draw_height > max_graph_height:
+                    draw_height = max_graph_height
+                    draw_width = draw_height / aspect if aspect > 0 else draw_width
+
+                if y_pos - draw_height < MARGIN: # Check space
+                    c.showPage(); c.setFont("Helvetica", 9.5); y_pos = height - MARGIN
+                    y_pos -= 0.3*cm # Space at top
+
+                c.drawImage(graph2_img, MARGIN, y_pos - draw_height,
+                            width=draw_width, height=draw_height, preserveAspectRatio=True, mask='auto')
+                # No need to decrease y_pos further after the last element
+            except Exception as graph2_err:
+                print(f"Error drawing top activities graph: {graph2_err}")
+                if y_pos < MARGIN + 1*cm: c.showPage(); c.setFont("Helvetica", 9.5); y_pos = height - MARGIN
+                c.drawString(MARGIN, y_pos, "[Top Activities graph could not be rendered]")
+        elif top_activities_dict:
+            draw_height = chart_height(len(top_activities_dict), max_height=7.5*cm)
+            if y_pos - draw_height < MARGIN: # Check space
+                c.showPage(); c.setFont("Helvetica", 9.5); y_pos = height - MARGIN - 0.3*cm
+            draw_bar_chart(c, MARGIN, y_pos, width - 2 * MARGIN, draw_height,
+                           [(format_activity_name(key), value) for key, value in top_activities_dict.items()],
+                           palette="Blues", axis_title=f"Emissions (kg {CO2_SUB})")
+
+        # --- Finalize PDF ---
+        c.save()
+        buffer.seek(0)
+        return buffer
+
+    except Exception as pdf_err:
+        print(f"Critical error during PDF generation: {pdf_err}")
+        print(traceback.format_exc())
+        buffer = BytesIO() # Return empty buffer on failure
+        buffer.seek(0)
+        return buffer
+
+
+def emissions_key(emissions):
+    """Stable hash of ``{activity: kg}`` used to key cached report artifacts."""
+    payload = json.dumps(sorted((k, round(float(v), 6)) for k, v in emissions.items()))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Horizontal bar charts drawn directly on a ReportLab canvas.
+
+Vector output in-process, replacing the kaleido PNG round trip for the
+report charts.
+"""
+import math
+
+from reportlab.lib.colors import Color, HexColor
+from reportlab.lib.units import cm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+# Light -> dark ends of the continuous scales used by the Breakdown page charts
+PALETTES = {
+    "Greens": (HexColor("#c7e9c0"), HexColor("#00441b")),
+    "Blues": (HexColor("#c6dbef"), HexColor("#08306b")),
+}
+
+FONT = "Helvetica"
+FONT_SIZE = 8
+BAR_HEIGHT_RATIO = 0.65
+
+
+def chart_height(n_bars, max_height=7 * cm):
+    """Height a chart with ``n_bars`` bars needs (axis included), capped at ``max_height``."""
+    return min(max_height, n_bars * 0.75 * cm + 1.4 * cm)
+
+
+def _ramp(palette, t):
+    low, high = PALETTES[palette]
+    return Color(low.red + (high.red - low.red) * t,
+                 low.green + (high.green - low.green) * t,
+                 low.blue + (high.blue - low.blue) * t)
+
+
+def _nice_step(max_value, target_ticks=5):
+    raw = max_value / target_ticks
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for multiple in (1, 2, 2.5, 5, 10):
+        if raw <= multiple * magnitude:
+            return multiple * magnitude
+    return 10 * magnitude
+
+
+def draw_bar_chart(c, x, y_top, width, height, items, palette="Greens", axis_title=""):
+    """Draw ``items`` (``[(label, value), ...]``) as a horizontal bar chart.
+
+    The chart occupies the box whose top-left corner is ``(x, y_top)``; the
+    largest value is drawn at the top, as in the on-screen Plotly charts.
+    """
+    items = sorted(((str(label), float(value)) for label, value in items), key=lambda item: item[1], reverse=True)
+    if not items:
+        return
+    max_value = max(value for _, value in items) or 1.0
+    step = _nice_step(max_value)
+    axis_max = step * math.ceil(max_value / step)
+
+    label_width = min(max(stringWidth(label, FONT, FONT_SIZE) for label, _ in items) + 0.3 * cm, width * 0.4)
+    value_room = stringWidth(f"{max_value:.1f}", FONT, FONT_SIZE) + 0.3 * cm
+    plot_x = x + label_width
+    plot_width = width - label_width - value_room
+    axis_y = y_top - height + 1.0 * cm  # room for tick labels and axis title
+    slot = (y_top - axis_y) / len(items)
+    bar_height = slot * BAR_HEIGHT_RATIO
+
+    c.saveState()
+    c.setFont(FONT, FONT_SIZE)
+
+    # Vertical grid lines and tick labels
+    c.setLineWidth(0.4)
+    c.setStrokeColor(HexColor("#dddddd"))
+    c.setFillColor(HexColor("#444444"))
+    tick = 0.0
+    while tick <= axis_max + step / 2:
+        tx = plot_x + plot_width * tick / axis_max
+        c.line(tx, axis_y, tx, y_top)
+        c.drawCentredString(tx, axis_y - 0.35 * cm, f"{tick:g}")
+        tick += step
+    if axis_title:
+        c.drawCentredString(plot_x + plot_width / 2, axis_y - 0.8 * cm, axis_title)
+
+    for i, (label, value) in enumerate(items):
+        slot_top = y_top - i * slot
+        bar_y = slot_top - (slot + bar_height) / 2
+        bar_width = plot_width * value / axis_max
+        c.setFillColor(_ramp(palette, value / max_value))
+        c.rect(plot_x, bar_y, bar_width, bar_height, stroke=0, fill=1)
+        c.setFillColor(HexColor("#222222"))
+        text_y = bar_y + bar_height / 2 - FONT_SIZE * 0.35
+        c.drawRightString(plot_x - 0.15 * cm, text_y, label)
+        c.drawString(plot_x + bar_width + 0.1 * cm, text_y, f"{value:.1f}")
+
+    c.setStrokeColor(HexColor("#888888"))
+    c.setLineWidth(0.6)
+    c.line(plot_x, axis_y, plot_x + plot_width, axis_y)
+    c.restoreState()
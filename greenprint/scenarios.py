@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""What-if scenarios evaluated in bulk against a factor column.
+
+A scenario is a short sequence of operations applied to the user's monthly
+quantities: ``Scale`` multiplies one activity, ``Substitute`` moves a fraction
+of one activity's quantity onto another. Scenarios are compiled into per-step
+index/coefficient arrays so that a whole batch is evaluated with a handful of
+NumPy operations, however many scenarios there are.
+"""
+from collections import namedtuple
+from itertools import combinations
+
+import numpy as np
+
+from greenprint.activities import ACTIVITIES
+
+Scale = namedtuple("Scale", ["activity", "factor"])
+Substitute = namedtuple("Substitute", ["source", "target", "fraction", "ratio"], defaults=(1.0, 1.0))
+Scenario = namedtuple("Scenario", ["operations"])
+
+# Lower-carbon alternatives offered by default (same unit on both sides)
+SUBSTITUTIONS = [
+    ("Petrol_car", "Electric_train"), ("Petrol_car", "Bus"), ("Petrol_car", "Ev_car"),
+    ("Diesel_car", "Electric_train"), ("Diesel_car", "Bus"), ("Diesel_car", "Ev_car"),
+    ("Domestic_flight", "Electric_train"), ("Motorcycle", "Ev_scooter"),
+    ("Diesel_train_local", "Electric_train"), ("Diesel_train_long", "Electric_train"),
+    ("Beef", "Poultry"), ("Pork", "Poultry"),
+]
+
+# Activities a household can realistically give up entirely; everything else is
+# only ever cut back (nobody drops electricity or water)
+DROPPABLE = frozenset(["Domestic_flight", "International_flight", "Beef", "Pork", "Other_meat", "Beverages",
+                       "Sugar"])
+
+_SCALE, _SUBSTITUTE = 1, 2
+
+ScenarioResults = namedtuple("ScenarioResults", ["scenarios", "baseline", "totals", "savings", "order"])
+
+
+class ScenarioEngine:
+    """Evaluates batches of scenarios for one activity ordering."""
+
+    def __init__(self, activities=ACTIVITIES):
+        self.activities = list(activities)
+        self.index = {activity: i for i, activity in enumerate(self.activities)}
+
+    def _compile(self, scenarios):
+        steps = max((len(s.operations) for s in scenarios), default=0)
+        shape = (steps, len(scenarios))
+        kind = np.zeros(shape, dtype=np.int8)
+        source = np.zeros(shape, dtype=np.intp)
+        target = np.zeros(shape, dtype=np.intp)
+        coef = np.zeros(shape)
+        ratio = np.ones(shape)
+        for j, scenario in enumerate(scenarios):
+            for step, op in enumerate(scenario.operations):
+                if isinstance(op, Scale):
+                    kind[step, j] = _SCALE
+                    source[step, j] = self.index[op.activity]
+                    coef[step, j] = op.factor
+                elif isinstance(op, Substitute):
+                    kind[step, j] = _SUBSTITUTE
+                    source[step, j] = self.index[op.source]
+                    target[step, j] = self.index[op.target]
+                    coef[step, j] = op.fraction
+                    ratio[step, j] = op.ratio
+                else:
+                    raise TypeError(f"Unknown scenario operation: {op!r}")
+        return kind, source, target, coef, ratio
+
+    def evaluate(self, quantities, factors, scenarios):
+        """Evaluate ``scenarios`` against ``quantities`` and a per-activity ``factors`` vector.
+
+        Returns ``ScenarioResults`` whose ``order`` ranks scenarios by savings,
+        largest first.
+        """
+        q = np.asarray(quantities, dtype=np.float64)
+        f = np.asarray(factors, dtype=np.float64)
+        baseline = float(q @ f)
+        scenarios = list(scenarios)
+        kind, source, target, coef, ratio = self._compile(scenarios)
+
+        # One row of quantities per scenario; each step touches at most one cell per row
+        Q = np.tile(q, (len(scenarios), 1))
+        rows = np.arange(len(scenarios))
+        for step in range(kind.shape[0]):
+            m = kind[step] == _SCALE
+            r, s = rows[m], source[step, m]
+            Q[r, s] *= coef[step, m]
+
+            m = kind[step] == _SUBSTITUTE
+            r, s, t = rows[m], source[step, m], target[step, m]
+            moved = Q[r, s] * coef[step, m]
+            Q[r, s] -= moved
+            Q[r, t] += moved * ratio[step, m]
+
+        totals = Q @ f
+        savings = baseline - totals
+        order = np.argsort(-savings, kind="stable")
+        return ScenarioResults(scenarios, baseline, totals, savings, order)
+
+
+def candidate_scenarios(quantities, factors, activities=ACTIVITIES, substitutions=SUBSTITUTIONS, combine_top=10,
+                        droppable=DROPPABLE):
+    """Default reduction ideas for the activities the user actually reported.
+
+    Single-step cuts and swaps are generated first (full drops only for
+    ``droppable`` activities); the ``combine_top`` single steps with the
+    largest savings are then paired up, which is how combined plans such as
+    "halve beef and take the train" appear.
+    """
+    index = {activity: i for i, activity in enumerate(activities)}
+    q = np.asarray(quantities, dtype=np.float64)
+    f = np.asarray(factors, dtype=np.float64)
+
+    singles = []
+    for activity, i in index.items():
+        if q[i] > 0 and f[i] > 0:
+            steps = (0.75, 0.5, 0.0) if activity in droppable else (0.75, 0.5)
+            singles += [Scenario((Scale(activity, k),)) for k in steps]
+    for src, dst in substitutions:
+        if src in index and dst in index and q[index[src]] > 0 and 0 < f[index[dst]] < f[index[src]]:
+            singles += [Scenario((Substitute(src, dst, fraction),)) for fraction in (0.5, 1.0)]
+    if not singles:
+        return []
+
+    engine = ScenarioEngine(activities)
+    results = engine.evaluate(q, f, singles)
+    best = [singles[i] for i in results.order[:combine_top] if results.savings[i] > 0]
+
+    def touched(scenario):
+        return {getattr(op, "activity", None) or op.source for op in scenario.operations}
+
+    combined = [Scenario(a.operations + b.operations) for a, b in combinations(best, 2)
+                if not touched(a) & touched(b)]
+    return singles + combined
+
+
+def describe(scenario, name=str):
+    """Human-readable label; ``name`` maps activity ids to display names."""
+    parts = []
+    for op in scenario.operations:
+        if isinstance(op, Scale):
+            if op.factor == 0:
+                parts.append(f"Drop {name(op.activity)}")
+            elif op.factor < 1:
+                parts.append(f"Cut {name(op.activity)} by {1 - op.factor:.0%}")
+            else:
+                parts.append(f"Raise {name(op.activity)} by {op.factor - 1:.0%}")
+        else:
+            share = "all" if op.fraction >= 1 else f"{op.fraction:.0%} of"
+            parts.append(f"Switch {share} {name(op.source)} to {name(op.target)}")
+    return " + ".join(parts)
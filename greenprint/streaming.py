@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Timing for streamed LLM responses."""
+import time
+
+
+class StreamTimer:
+    """Wraps a token generator and records time-to-first-token and throughput.
+
+    Each item yielded by the generator counts as one token (llama-index yields
+    one delta per generated token).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.finished = None
+        self.tokens = 0
+
+    def wrap(self, deltas):
+        for delta in deltas:
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+            self.tokens += 1
+            yield delta
+        self.finished = time.perf_counter()
+
+    @property
+    def time_to_first_token(self):
+        return None if self.first_token_at is None else self.first_token_at - self.started
+
+    @property
+    def tokens_per_second(self):
+        if self.finished is None or self.first_token_at is None:
+            return None
+        generating = self.finished - self.first_token_at
+        # The first token marks the start of generation, so it is not counted in the rate
+        return (self.tokens - 1) / generating if generating > 0 else None
+
+    def as_dict(self):
+        return {"ttft_s": self.time_to_first_token, "tokens": self.tokens,
+                "tokens_per_s": self.tokens_per_second,
+                "total_s": None if self.finished is None else self.finished - self.started}
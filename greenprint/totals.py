@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Running footprint total that is updated one activity at a time."""
+import numpy as np
+
+from greenprint.activities import ACTIVITIES, CATEGORIES
+
+
+class FootprintTotals:
+    """Per-activity contributions and their total.
+
+    ``set_quantity`` touches one activity's contribution. The total is
+    re-summed from the contributions (one pass over a few dozen floats) rather
+    than adjusted by deltas, so it never drifts away from zero: once every
+    input is back at 0 it is exactly 0.0. Category totals are computed where
+    they are shown, with ``greenprint.aggregate.category_totals``.
+    """
+
+    def __init__(self, factors, country=None, activities=ACTIVITIES, categories=CATEGORIES):
+        self.country = country
+        self.activities = list(activities)
+        self.index = {activity: i for i, activity in enumerate(self.activities)}
+        self.category_of = {activity: category for category, acts in categories.items() for activity in acts}
+        self.quantities = np.zeros(len(self.activities))
+        self.contributions = np.zeros(len(self.activities))
+        self.total = 0.0
+        self.set_factors(factors)
+
+    def set_factors(self, factors):
+        """Swap the factor column (e.g. on country change) and recompute from scratch."""
+        self.factors = np.asarray(factors, dtype=np.float64)
+        self.resync()
+
+    def resync(self):
+        """Recompute the contributions and the total from the stored quantities."""
+        np.multiply(self.quantities, self.factors, out=self.contributions)
+        self.total = float(self.contributions.sum())
+
+    def set_quantity(self, activity, quantity):
+        """Record a new quantity for one activity; returns the change in emissions."""
+        i = self.index[activity]
+        quantity = float(quantity)
+        if quantity == self.quantities[i]:
+            return 0.0
+        contribution = quantity * float(self.factors[i])
+        delta = contribution - float(self.contributions[i])
+        self.quantities[i] = quantity
+        self.contributions[i] = contribution
+        self.total = float(self.contributions.sum())
+        return delta
+
+    def emissions(self):
+        """Positive per-activity contributions as an ``{activity: kg CO2}`` dict."""
+        return {activity: float(self.contributions[i]) for activity, i in self.index.items()
+                if self.contributions[i] > 0}
+
+    def entries(self):
+        """``(activity, category, quantity, emission)`` for every activity with a quantity."""
+        return [(activity, self.category_of.get(activity, ""), float(self.quantities[i]), float(self.contributions[i]))
+                for activity, i in self.index.items() if self.quantities[i] > 0]
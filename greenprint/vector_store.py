@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""Binary, memory-mapped storage for chunk embeddings.
+
+Embeddings live in one contiguous ``embeddings.npy`` matrix (float32, or
+float16 to halve the size) that is memory-mapped on load. Rows are stored
+L2-normalised, so cosine search can score the map directly
+(greenprint.retrieval); the manifest's ``unit_rows`` records this for files
+written before it was the rule. The node id of each
+row is kept in the index catalog (greenprint.index_catalog). Ingestion
+appends rows at the end of the file in place and only then commits the
+catalog, which is what makes them visible: readers map exactly the committed
+number of rows.
+
+``convert_simple_vector_store`` migrates an existing llama-index
+``default__vector_store.json`` without re-embedding anything, writes the
+catalog and BM25 index next to it and then deletes the JSON file, which
+nothing reads any more.
+
+Usage::
+
+    python -m greenprint.vector_store vector_index --dtype float16
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from numpy.lib import format as npy_format
+
+from greenprint import index_catalog
+from greenprint.retrieval import normalize
+
+EMBEDDINGS_FILE = index_catalog.EMBEDDINGS_FILE
+SIMPLE_STORE_FILE = "default__vector_store.json"
+DTYPES = ("float32", "float16")
+
+
+class MmapVectorStore:
+    """Read-only view of an embedding matrix plus its node ids.
+
+    ``ids[row]`` is None for rows deleted since the index was last compacted,
+    and ``normalized`` is True when the rows are unit length.
+    """
+
+    def __init__(self, embeddings, ids, ref_doc_ids=None, normalized=False):
+        if len(ids) != embeddings.shape[0]:
+            raise ValueError(f"{len(ids)} ids for {embeddings.shape[0]} embeddings.")
+        self.embeddings = embeddings
+        self.ids = list(ids)
+        self.ref_doc_ids = list(ref_doc_ids) if ref_doc_ids is not None else [None] * len(self.ids)
+        self.normalized = normalized
+        self.row_of = {node_id: row for row, node_id in enumerate(self.ids) if node_id is not None}
+
+    @property
+    def dim(self):
+        return self.embeddings.shape[1]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get(self, node_id):
+        """Embedding of one node as float32."""
+        return np.asarray(self.embeddings[self.row_of[node_id]], dtype=np.float32)
+
+    @classmethod
+    def load(cls, persist_dir, mmap=True, snapshot=None):
+        """Rows committed as of ``snapshot`` (default: the catalog's current state)."""
+        persist_dir = Path(persist_dir)
+        snapshot = snapshot or index_catalog.snapshot(persist_dir)
+        embeddings = read_rows(persist_dir / snapshot.manifest["embeddings"], len(snapshot.node_ids), mmap)
+        return cls(embeddings, snapshot.node_ids, snapshot.ref_doc_ids, snapshot.manifest["unit_rows"])
+
+
+def _read_header(f):
+    version = npy_format.read_magic(f)
+    if version != (1, 0):
+        raise ValueError(f"Unsupported .npy format version {version}.")
+    shape, fortran_order, dtype = npy_format.read_array_header_1_0(f)
+    if fortran_order or len(shape) != 2:
+        raise ValueError("Embedding file must hold a C-ordered 2-D matrix.")
+    return shape, dtype, f.tell()
+
+
+def read_rows(path, count, mmap=True):
+    """The first ``count`` rows of the matrix in ``path``; later rows are not committed yet."""
+    with open(path, "rb") as f:
+        shape, dtype, offset = _read_header(f)
+        if shape[0] < count:
+            raise ValueError(f"{path} has {shape[0]} rows, the catalog lists {count}.")
+        if not mmap:
+            return np.fromfile(f, dtype=dtype, count=count * shape[1]).reshape(count, shape[1])
+    if count == 0:
+        return np.empty((0, shape[1]), dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count, shape[1]))
+
+
+def write_matrix(path, embeddings, dtype="float32"):
+    """Write a new matrix file of unit-length rows; replaced atomically."""
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {DTYPES}")
+    matrix = np.ascontiguousarray(normalize(embeddings), dtype=dtype)
+    _atomic_write(Path(path), lambda f: np.save(f, matrix))
+
+
+def append_rows(path, first_row, rows):
+    """Write ``rows``, normalised, in place from row ``first_row`` on; returns the new row count.
+
+    Rows past ``first_row`` were never committed and are overwritten. The
+    header's row count is updated last; ``np.save`` pads the header so that
+    the count can grow without moving the data.
+    """
+    with open(path, "r+b") as f:
+        shape, dtype, offset = _read_header(f)
+        rows = np.ascontiguousarray(normalize(np.reshape(rows, (-1, shape[1]))), dtype=dtype)
+        count = first_row + len(rows)
+        header = io.BytesIO()
+        npy_format.write_array_header_1_0(header, {"descr": npy_format.dtype_to_descr(dtype),
+                                                   "fortran_order": False, "shape": (count, shape[1])})
+        if header.tell() != offset:
+            raise ValueError(f"The header of {path} has no room for {count} rows; compact the index.")
+        f.truncate(offset + first_row * rows.itemsize * shape[1])
+        f.seek(0, os.SEEK_END)
+        f.write(rows.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+        f.seek(0)
+        f.write(header.getvalue())
+        f.flush()
+        os.fsync(f.fileno())
+    return count
+
+
+def _atomic_write(path, write):
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}-", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def convert_simple_vector_store(persist_dir, dtype="float32", keep_json=False):
+    """Convert ``default__vector_store.json`` in ``persist_dir`` into the binary layout."""
+    from llama_index.core.storage.docstore import SimpleDocumentStore
+
+    from greenprint.ingest import write_index_files
+
+    persist_dir = Path(persist_dir)
+    json_path = persist_dir / SIMPLE_STORE_FILE
+    data = json.loads(json_path.read_text(encoding="utf-8"))
+    embedding_dict = data.get("embedding_dict", {})
+    if not embedding_dict:
+        raise ValueError(f"No embeddings found in {json_path}.")
+    ids = list(embedding_dict)
+    matrix = np.array([embedding_dict[node_id] for node_id in ids], dtype=np.float32)
+    ref_doc_ids = [data.get("text_id_to_ref_doc_id", {}).get(node_id) for node_id in ids]
+    docstore = SimpleDocumentStore.from_persist_path(str(persist_dir / index_catalog.DOCSTORE_FILE))
+    nodes = docstore.get_nodes(ids)
+    index_catalog.create(persist_dir, nodes, ref_doc_ids, write_index_files(persist_dir, nodes, matrix, dtype=dtype))
+    if not keep_json:
+        json_path.unlink()
+    return len(ids), matrix.shape[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a persisted llama-index vector store to binary.")
+    parser.add_argument("persist_dir", help="Directory containing default__vector_store.json")
+    parser.add_argument("--dtype", choices=DTYPES, default="float32")
+    parser.add_argument("--keep-json", action="store_true", help=f"Do not delete {SIMPLE_STORE_FILE}")
+    args = parser.parse_args(argv)
+    count, dim = convert_simple_vector_store(args.persist_dir, args.dtype, args.keep_json)
+    print(f"Wrote {count} x {dim} {args.dtype} embeddings to {Path(args.persist_dir) / EMBEDDINGS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
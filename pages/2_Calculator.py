@@ -7,6 +7,13 @@ import plotly.express as px
 # from reportlab.lib.units import cm     # PDF generation commented out
 from io import BytesIO
 import traceback
+from greenprint.activities import ACTIVITIES, activities_in, format_activity_name
+from greenprint.calculator import comparison_averages, comparison_color, tree_equivalent
+from greenprint.datasets import load_datasets
+from greenprint.history import HistoryStore, month_key, user_key
+from greenprint.history_report import write_history_report
+from greenprint.scenarios import ScenarioEngine, candidate_scenarios, describe
+from greenprint.totals import FootprintTotals
 
 # --- App Config ---
 st.set_page_config(page_title="GreenPrint", page_icon="🌿", layout="centered")
@@ -74,6 +81,7 @@ def init_session_state():
         "selected_country": "-- Select --",
         "current_tab_index": 0,
         "emission_values": {},
+        "footprint_totals": None,
         "calculation_done": False,
         "calculated_emission": None,
         "comparison_plot_data": None
@@ -83,48 +91,34 @@ def init_session_state():
             st.session_state[key] = value
 
 init_session_state()
-csv_url = "https://raw.githubusercontent.com/keanyaoha/Carbon-Footprint/main/emission_factor_formated.csv"
-csv_url_1 = "https://raw.githubusercontent.com/keanyaoha/Carbon-Footprint/main/per_capita_filtered_monthly.csv"
 
-@st.cache_data
-def load_data(csv_url, csv_url_1):
+# Bundled CSVs are compiled once into a memory-mapped cache and shared by every session.
+# Set GREENPRINT_DATA_URL to load them from a remote location instead.
+# Country averages are indexed by normalized name (with aliases such as Czech -> Czechia).
+@st.cache_resource
+def load_data():
     try:
-        df_emis = pd.read_csv(csv_url)
-        df_cap = pd.read_csv(csv_url_1)
-        df_emis.columns = df_emis.columns.str.strip()
-        if 'Activity' not in df_emis.columns:
-             st.error("Emission data CSV is missing 'Activity' column.")
-             return None, None
-        return df_emis, df_cap
+        data = load_datasets()
+        return data.factors, data.averages, data.averages.missing(data.factors.countries)
     except Exception as e:
         st.error(f"Error loading data: {e}")
-        return None, None
+        return None, None, []
 
-df, df1 = load_data(csv_url, csv_url_1)
+factor_matrix, country_averages, unmatched_countries = load_data()
 
-if df is None or df1 is None:
+if factor_matrix is None or country_averages is None:
     st.warning("Data loading failed. App cannot continue.")
     st.stop()
 
-available_countries = sorted([col for col in df.columns if col != "Activity"])
-
-# Function to format activity names
-def format_activity_name(activity):
-    activity_mappings = {
-           "Domestic_flight": "Domestic Flights", "International_flight": "International Flights",
-                  "Diesel_train_local": "Diesel Local Train", "Diesel_train_long": "Diesel Long-Dist Train",
-                  "Electric_train": "Electric Train", "Bus": "Bus",
-                  "Petrol_car": "Petrol Car", "Motorcycle": "Motorcycle",
-                  "Ev_scooter": "E-Scooter", "Ev_car": "Electric Car",
-                  "Diesel_car": "Diesel Car", "Beef": "Beef Products",
-                  "Poultry": "Poultry Products", "Beverages": "Beverages", "Pork": "Pork Products",
-                  "Fish_products": "Fish Products", "Other_meat": "Other Meat Products",
-                  "Rice": "Rice", "Sugar": "Sugar",
-                  "Oils_fats": "Veg Oils/Fats", "Dairy": "Dairy Products",
-                  "Other_food": "Other Food", "Water": "Water",
-                  "Electricity": "Electricity", "Hotel_stay": "Hotel Stay",
-    }
-    return activity_mappings.get(activity, activity.replace("_", " ").capitalize())
+if unmatched_countries:
+    st.warning(f"No per-capita average available for: {', '.join(unmatched_countries)}.")
+
+available_countries = sorted(factor_matrix.countries)
+
+# One SQLite connection per server process for the monthly history
+@st.cache_resource
+def get_history_store():
+    return HistoryStore()
 
 # --- App Title ---
 st.title("🌍 Carbon Footprint Calculator")
@@ -150,6 +144,7 @@ if selected_country_widget != st.session_state.selected_country:
     st.session_state.selected_country = selected_country_widget
     st.session_state.current_tab_index = 0
     st.session_state.emission_values = {}
+    st.session_state.footprint_totals = None
     st.session_state.calculation_done = False
     st.session_state.calculated_emission = None
     st.session_state.comparison_plot_data = None
@@ -171,6 +166,17 @@ if st.session_state.selected_country != "-- Select --":
         st.session_state.current_tab_index = clicked_index
         st.rerun()
 
+    # Running totals for the selected country, rebuilt only when the country changes
+    if st.session_state.footprint_totals is None or st.session_state.footprint_totals.country != country:
+        country_factors = factor_matrix.aligned(ACTIVITIES)[:, factor_matrix.country_index[country]]
+        st.session_state.footprint_totals = FootprintTotals(country_factors, country)
+
+    # Only the input that changed updates its contribution and the running totals
+    def on_activity_input_change(activity, input_key):
+        user_input = st.session_state[input_key]
+        st.session_state.emission_values[f"{input_key}_input"] = user_input
+        st.session_state.footprint_totals.set_quantity(activity, user_input)
+
     def display_activity_inputs(activities, category_key, current_country):
         if not isinstance(activities, list): return
         for activity in activities:
@@ -179,37 +185,17 @@ if st.session_state.selected_country != "-- Select --":
             if f"{input_key}_input" not in st.session_state.emission_values:
                  st.session_state.emission_values[f"{input_key}_input"] = 0.0
             default_value = st.session_state.emission_values.get(f"{input_key}_input", 0.0)
-            user_input = st.number_input(label, min_value=0.0, step=0.1, key=input_key, value=float(default_value))
-            st.session_state.emission_values[f"{input_key}_input"] = user_input
-            try:
-                if activity not in df['Activity'].values:
-                     st.session_state.emission_values[activity] = 0.0
-                     continue
-                factor_series = df.loc[df["Activity"] == activity, current_country]
-                if not factor_series.empty:
-                    factor = factor_series.iloc[0]
-                    st.session_state.emission_values[activity] = 0.0 if pd.isna(factor) else user_input * float(factor)
-                else:
-                    st.session_state.emission_values[activity] = 0.0
-            except Exception as e:
-                # Keep error reporting minimal unless debugging
-                # st.error(f"Calc error for {label}: {e}")
-                st.session_state.emission_values[activity] = 0.0
-
-    # Define Activity Lists
-    transport_activities = ["Domestic_flight", "International_flight", "Diesel_train_local", "Diesel_train_long", "Electric_train",  "Bus", "Petrol_car", "Ev_car", "Ev_scooter", "Motorcycle", "Diesel_car"]
-    food_activities = ["Beef", "Poultry", "Pork", "Dairy", "Fish_products", "Rice", "Sugar", "Oils_fats", "Other_food", "Beverages", "Other_meat"]
-    energy_water_activities = ["Electricity", "Water"]
-    hotel_activities = ["Hotel_stay"]
-    
+            st.number_input(label, min_value=0.0, step=0.1, key=input_key, value=float(default_value),
+                            on_change=on_activity_input_change, args=(activity, input_key))
+
     # Display Tabs
     current_index = st.session_state.current_tab_index
     if current_index == 0:
-        display_activity_inputs(transport_activities, "transport", country)
+        display_activity_inputs(activities_in("transport"), "transport", country)
         if st.button("Next →", key="next_transport", use_container_width=False):
             st.session_state.current_tab_index = 1; st.rerun()
     elif current_index == 1:
-        display_activity_inputs(food_activities, "food", country)
+        display_activity_inputs(activities_in("food"), "food", country)
         col1, col2 = st.columns(2)
         with col1:
             if st.button("← Previous", key="prev_food", use_container_width=False):
@@ -218,7 +204,7 @@ if st.session_state.selected_country != "-- Select --":
             if st.button("Next →", key="next_food", use_container_width=False):
                 st.session_state.current_tab_index = 2; st.rerun()
     elif current_index == 2:
-        display_activity_inputs(energy_water_activities, "energy", country)
+        display_activity_inputs(activities_in("energy"), "energy", country)
         col1, col2 = st.columns(2)
         with col1:
             if st.button("← Previous", key="prev_energy", use_container_width=False):
@@ -227,7 +213,7 @@ if st.session_state.selected_country != "-- Select --":
             if st.button("Next →", key="next_energy", use_container_width=False):
                 st.session_state.current_tab_index = 3; st.rerun()
     elif current_index == 3:
-        display_activity_inputs(hotel_activities, "hotel", country)
+        display_activity_inputs(activities_in("hotel"), "hotel", country)
         if st.button("← Previous", key="prev_hotel", use_container_width=False):
             st.session_state.current_tab_index = 2; st.rerun()
 
@@ -237,25 +223,43 @@ if st.session_state.selected_country != "-- Select --":
         reviewed_all = st.checkbox("I have reviewed/entered my data for all categories.", key="review_final_check")
         if reviewed_all:
             if st.button("Calculate My Carbon Footprint", type="primary", use_container_width=True, key="calculate_final_button"):
-                emission_values_to_sum = {k: v for k, v in st.session_state.emission_values.items() if not k.endswith('_input') and isinstance(v, (int, float)) and v > 0}
-                if not emission_values_to_sum:
+                total_emission = st.session_state.footprint_totals.total
+                if total_emission <= 0:
                      st.warning("No positive emissions calculated.")
                      st.session_state.calculation_done = False
                 else:
-                    st.session_state.calculated_emission = sum(emission_values_to_sum.values())
-                    def get_avg(name, df_avg):
-                        if df_avg is None or "Country" not in df_avg.columns or "PerCapitaCO2" not in df_avg.columns: return None
-                        match = df_avg.loc[df_avg["Country"] == name, "PerCapitaCO2"]
-                        return match.iloc[0] if not match.empty and pd.notna(match.iloc[0]) else None
-                    st.session_state.comparison_plot_data = {
-                         "country": {"name": country, "avg": get_avg(country, df1)},
-                         "eu": {"name": "EU Average", "avg": get_avg("European Union (27)", df1)},
-                         "world": {"name": "World Average", "avg": get_avg("World", df1)}}
+                    st.session_state.calculated_emission = total_emission
+                    # Missing averages are reported as "not available" next to the comparison plot
+                    st.session_state.comparison_plot_data = comparison_averages(country, country_averages)
                     st.session_state.calculation_done = True
                     st.rerun()
         else:
             st.info("Check the box above to enable calculation.")
 
+    # --- Same Lifestyle, Every Country (refreshes live as inputs change) ---
+    totals = st.session_state.footprint_totals
+    if totals.total > 0:
+        with st.expander("🌍 Your lifestyle in every EU country"):
+            ranking = factor_matrix.rank_countries(ACTIVITIES, totals.quantities)
+            df_countries = pd.DataFrame(ranking, columns=["Country", "Your footprint"])
+            df_countries["Country average"] = country_averages.values_for(df_countries["Country"])
+            df_countries["Type"] = ["Your country" if name == country else "Other" for name in df_countries["Country"]]
+            fig_countries = px.bar(
+                df_countries, x="Your footprint", y="Country", orientation='h', color="Type",
+                color_discrete_map={"Your country": '#1a9850', "Other": '#a6cee3'},
+                labels={'Your footprint': 'kg CO₂ per month', 'Country': ''}
+            )
+            fig_countries.add_scatter(
+                x=df_countries["Country average"], y=df_countries["Country"], mode="markers",
+                name="Country average", marker=dict(color='#e41a1c', symbol="line-ns-open", size=12)
+            )
+            fig_countries.update_layout(yaxis={'categoryorder': 'array', 'categoryarray': df_countries["Country"][::-1]},
+                                        height=650, margin=dict(l=5, r=5, t=30, b=20))
+            st.plotly_chart(fig_countries, use_container_width=True)
+            lowest, highest = ranking[0], ranking[-1]
+            st.caption(f"Lowest in {lowest[0]} ({lowest[1]:.1f} kg), highest in {highest[0]} ({highest[1]:.1f} kg). "
+                       "Red marks show each country's per-capita monthly average.")
+
     # --- Display Results Area ---
     if st.session_state.get('calculation_done', False):
         st.divider()
@@ -263,10 +267,8 @@ if st.session_state.selected_country != "-- Select --":
         total_emission = st.session_state.get('calculated_emission', 0)
         if total_emission > 0:
             st.metric(label="kg CO₂ equivalent", value=f"{total_emission:.1f}")
-            tree_absorb_monthly = (21.77 / 12.0)
-            if tree_absorb_monthly > 0:
-                 trees_monthly_equiv = total_emission / tree_absorb_monthly
-                 st.markdown(f"Equivalent to CO₂ absorbed by **{trees_monthly_equiv:.1f} trees** in a month.")
+            trees_monthly_equiv = tree_equivalent(total_emission)
+            st.markdown(f"Equivalent to CO₂ absorbed by **{trees_monthly_equiv:.1f} trees** in a month.")
 
             st.divider()
             st.subheader("📈 Comparison with Averages")
@@ -280,14 +282,7 @@ if st.session_state.selected_country != "-- Select --":
                 world_avg_value = comparison_data['world'].get('avg')
 
             # --- Conditional Color Logic ---
-            you_color = '#1a9850' # Default Green
-            color_reason = ""
-            if world_avg_value is not None:
-                if total_emission > world_avg_value:
-                    you_color = '#e41a1c' # Red
-                    color_reason = "(above world average)"
-                else:
-                     color_reason = "(below or equal to world average)"
+            you_color, color_reason = comparison_color(total_emission, world_avg_value)
             color_map = {'You': you_color, 'Average': '#a6cee3'} # Light Blue for Averages
             # --------------------------------
 
@@ -317,9 +312,6 @@ if st.session_state.selected_country != "-- Select --":
             if plot_data_list:
                 df_comparison = pd.DataFrame(plot_data_list)
 
-                # Define sustainability target
-                sustainable_target = 167 # kg CO2e/month (~2 tonnes/year)
-
                 try:
                     fig_comp = px.bar(
                         df_comparison.sort_values("Emissions", ascending=True),
@@ -356,6 +348,68 @@ if st.session_state.selected_country != "-- Select --":
                     st.error(traceback.format_exc()) # Show detailed traceback for debugging
             else:
                 st.warning("No data available for comparison plot.")
+
+            # --- What-if Scenarios ---
+            st.divider()
+            st.subheader("🔄 What If? Ways to Reduce Your Footprint")
+            totals = st.session_state.footprint_totals
+            scenarios = candidate_scenarios(totals.quantities, totals.factors)
+            if scenarios:
+                # Every candidate is scored in one vectorized pass and ranked by savings
+                results = ScenarioEngine().evaluate(totals.quantities, totals.factors, scenarios)
+                top = [i for i in results.order[:10] if results.savings[i] > 0]
+                df_scenarios = pd.DataFrame({
+                    "Scenario": [describe(results.scenarios[i], format_activity_name) for i in top],
+                    "New total (kg CO₂)": results.totals[top],
+                    "Saving (kg CO₂)": results.savings[top],
+                    "Saving (%)": 100 * results.savings[top] / results.baseline,
+                })
+                st.dataframe(df_scenarios.round(1), hide_index=True, use_container_width=True)
+                st.caption(f"Best {len(top)} of {len(scenarios)} scenarios evaluated.")
+            else:
+                st.info("Enter some activities above to see reduction scenarios.")
+
+            # --- Monthly History ---
+            st.divider()
+            st.subheader("🗓️ Your Monthly History")
+            profile = st.session_state.get("user_profile")
+            if not profile:
+                st.info("Create a profile on the Profile page to save this footprint and follow your trend.")
+            else:
+                history = get_history_store()
+                user_id = user_key(profile)
+                col1, col2 = st.columns([2, 1])
+                with col1:
+                    history_month = st.date_input("Month of this footprint", key="history_month")
+                with col2:
+                    st.write("")
+                    if st.button("💾 Save Month", key="save_history_month"):
+                        history.upsert_user(profile)
+                        history.record_month(user_id, month_key(history_month), country, totals.entries())
+                        st.success(f"Saved {month_key(history_month)}.")
+
+                trend = history.monthly_trend(user_id, window=3, limit=12)
+                if trend:
+                    df_trend = pd.DataFrame(trend, columns=["Month", "Total", "3-month average", "Change"])
+                    latest = trend[-1]
+                    st.metric(label=f"kg CO₂ in {latest[0]}", value=f"{latest[1]:.1f}",
+                              delta=None if latest[3] is None else f"{latest[3]:+.1f} vs previous month",
+                              delta_color="inverse")
+                    st.line_chart(df_trend.set_index("Month")[["Total", "3-month average"]])
+                    category_trend = history.category_trend(user_id, since=trend[0][0])
+                    if category_trend:
+                        df_categories = pd.DataFrame(
+                            {category: dict(points) for category, points in category_trend.items()}).sort_index()
+                        st.caption("Emissions by category")
+                        st.line_chart(df_categories)
+                    if st.button("📄 Prepare History Report", key="prepare_history_report"):
+                        history_pdf = BytesIO()
+                        with st.spinner("Rendering your history..."):
+                            write_history_report(history, user_id, history_pdf)
+                        st.download_button(label="⬇️ Download History as PDF", data=history_pdf.getvalue(),
+                                           file_name="GreenPrint_History.pdf", mime="application/pdf")
+                else:
+                    st.caption("No saved months yet.")
         else:
             st.info("Your calculated emissions are zero. Nothing to display.")
 
@@ -1,40 +1,26 @@
 # Import necessary libraries
-from llama_index.llms.huggingface import HuggingFaceInferenceAPI
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from llama_index.core import StorageContext, load_index_from_storage
 from llama_index.core.chat_engine import ContextChatEngine
 from llama_index.core.memory import ChatMemoryBuffer
 from llama_index.core.base.llms.types import ChatMessage, MessageRole
 import streamlit as st
 import os
+import uuid
+from greenprint.chat_sessions import MEMORY_TOKEN_LIMIT, SessionPool, trim_history
+from greenprint.answer_cache import index_fingerprint, is_self_contained
+from greenprint.streaming import StreamTimer
+from greenprint.rag import PERSIST_DIR, embed_query, get_answer_cache, get_llm, get_query_cache, get_retriever
 
 # --- Configuration ---
-
-# LLM Configuration (Fixed)
-hf_model = "mistralai/Mistral-7B-Instruct-v0.3"
-llm = HuggingFaceInferenceAPI(model_name=hf_model)
-
-# Embeddings Configuration
-embedding_model = "sentence-transformers/all-MiniLM-l6-v2"
-embeddings = HuggingFaceEmbedding(model_name=embedding_model)
+# The LLM client, embedding model and chunk index are process-wide resources
+# (see greenprint.rag); a rerun only looks them up instead of reloading them.
 
 # Vector Database Configuration
-persist_directory = "vector_index"
+persist_directory = PERSIST_DIR
 
 if not os.path.exists(persist_directory):
-    st.error(f"❌ Error: Vector index directory '{persist_directory}' not found. Make sure it's in your GitHub repository root.")
+    st.error(f"❌ Error: Vector index directory '{persist_directory.name}' not found. Make sure it's in your GitHub repository root.")
     st.stop()
 
-try:
-    storage_context = StorageContext.from_defaults(persist_dir=persist_directory)
-    vector_index = load_index_from_storage(storage_context, embed_model=embeddings)
-except Exception as e:
-    st.error(f"❌ Error loading vector index from '{persist_directory}': {e}")
-    st.stop()
-
-# Retriever Configuration
-retriever = vector_index.as_retriever(similarity_top_k=2)
-
 # Prompt Configuration
 prompts = [
     ChatMessage(role=MessageRole.SYSTEM, content="You are a nice chatbot having a conversation with a human."),
@@ -42,33 +28,61 @@ prompts = [
     ChatMessage(role=MessageRole.SYSTEM, content="Keep your answers short and succinct.")
 ]
 
-# Memory Configuration
-memory = ChatMemoryBuffer.from_defaults()
-
 # --- Bot Initialization ---
+# Every browser session keeps its own token-bounded memory buffer in the pool (idle
+# sessions are reclaimed after 30 minutes)
 @st.cache_resource
-def init_bot():
-    try:
-        engine = ContextChatEngine.from_defaults(
-            llm=llm,
-            retriever=retriever,
-            memory=memory,
-            prefix_messages=prompts,
-            verbose=True
-        )
-        return engine
-    except Exception as e:
-        st.error(f"❌ Failed to initialize chatbot engine: {e}")
-        return None
-
-rag_bot = init_bot()
-
-if rag_bot is None:
+def get_session_pool():
+    return SessionPool(lambda: ChatMemoryBuffer.from_defaults(token_limit=MEMORY_TOKEN_LIMIT))
+
+if "chat_session_id" not in st.session_state:
+    st.session_state.chat_session_id = uuid.uuid4().hex
+
+memory = get_session_pool().get(st.session_state.chat_session_id)
+
+# The engine is rebuilt around the session's memory on every run. That is cheap, and it
+# always picks up the current LLM and retriever, including after an ingestion.
+try:
+    # Dense scoring over the memory-mapped embedding matrix, fused with BM25 keyword matches.
+    # Each question is embedded (and counted in the cache stats) by embed_query below
+    # before the engine retrieves, so the retriever's lookup is not counted again
+    retriever = get_retriever(similarity_top_k=2, persist_dir=persist_directory, record_cache_hits=False)
+except Exception as e:
+    st.error(f"❌ Error loading vector index from '{persist_directory.name}': {e}")
+    st.stop()
+
+try:
+    rag_bot = ContextChatEngine.from_defaults(
+        llm=get_llm(),
+        retriever=retriever,
+        memory=memory,
+        prefix_messages=prompts,
+        verbose=True
+    )
+except Exception as e:
+    st.error(f"❌ Failed to initialize chatbot engine: {e}")
     st.stop()
 
 # --- Streamlit UI ---
 st.title("💬 CarbonFootprint Chatbot")
 
+# Query-embedding cache counters (this server process)
+with st.sidebar:
+    cache_stats = get_query_cache().stats()
+    st.caption(
+        f"Query embedding cache: {cache_stats['hit_rate']:.0%} hit rate "
+        f"({cache_stats['memory_hits'] + cache_stats['disk_hits']} hits, {cache_stats['misses']} misses), "
+        f"~{cache_stats['seconds_saved']:.1f}s saved"
+    )
+    answer_stats = get_answer_cache(persist_directory).stats()
+    st.caption(f"Answer cache: {answer_stats['entries']} answers, {answer_stats['hit_rate']:.0%} hit rate")
+    stream_responses = st.toggle("Stream responses", value=True)
+    turn_metrics = st.session_state.get("chat_turn_metrics", [])
+    if turn_metrics and turn_metrics[-1]["ttft_s"] is not None:
+        last = turn_metrics[-1]
+        rate = f", {last['tokens_per_s']:.1f} tokens/s" if last["tokens_per_s"] else ""
+        st.caption(f"Last answer: first token after {last['ttft_s']:.2f}s{rate}")
+
 # Display chat messages from history
 if hasattr(rag_bot, 'chat_history') and rag_bot.chat_history:
     for message in rag_bot.chat_history:
@@ -85,13 +99,42 @@ if hasattr(rag_bot, 'chat_history') and rag_bot.chat_history:
 # User input and response handling
 if prompt := st.chat_input("Curious minds wanted!"):
     st.chat_message("user").markdown(prompt)
-    with st.spinner("🔍 Digging for answers..."):
+    with st.chat_message("assistant"):
+        placeholder = st.empty()
+        timer = StreamTimer()  # time to first token is measured from the prompt, retrieval included
         try:
-            answer = rag_bot.chat(prompt)
-            response_text = getattr(answer, 'response', '❌ Sorry, I could not process that.')
-            with st.chat_message("assistant"):
-                st.markdown(response_text)
+            with st.spinner("🔍 Digging for answers..."):
+                # Near-duplicate questions reuse an earlier answer, but only when the answer
+                # cannot depend on this conversation (first turn, or no reference back to it)
+                answer_cache = get_answer_cache(persist_directory)
+                answer_cache.validate(index_fingerprint(persist_directory))
+                first_turn = not rag_bot.chat_history
+                question_embedding = embed_query(prompt)
+                cached = answer_cache.lookup(question_embedding) if first_turn or is_self_contained(prompt) else None
+
+                if cached is not None:
+                    response_text = cached[1]
+                    memory.put(ChatMessage(role=MessageRole.USER, content=prompt))
+                    memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=response_text))
+                elif stream_responses:
+                    # Retrieval runs here; tokens are rendered below as the LLM produces them
+                    streaming_answer = rag_bot.stream_chat(prompt)
+                    response_text = None
+                else:
+                    answer = rag_bot.chat(prompt)
+                    response_text = getattr(answer, 'response', None)
+
+            if cached is None and stream_responses:
+                response_text = ""
+                for delta in timer.wrap(streaming_answer.response_gen):
+                    response_text += delta
+                    placeholder.markdown(response_text + "▌")
+                st.session_state.setdefault("chat_turn_metrics", []).append(timer.as_dict())
+
+            if cached is None and response_text and first_turn:
+                answer_cache.store(prompt, question_embedding, response_text)
+            trim_history(memory)
+            placeholder.markdown(response_text or '❌ Sorry, I could not process that.')
         except Exception as e:
             st.error(f"Error during chat processing: {e}")
-            with st.chat_message("assistant"):
-                st.markdown("❌ Sorry, an error occurred while trying to get an answer.")
+            placeholder.markdown("❌ Sorry, an error occurred while trying to get an answer.")
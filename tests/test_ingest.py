@@ -0,0 +1,163 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("llama_index.core")
+pytest.importorskip("llama_index.readers.file")
+
+from llama_index.core.embeddings import MockEmbedding  # noqa: E402
+from llama_index.core.node_parser import SentenceSplitter  # noqa: E402
+from llama_index.core.storage.docstore import SimpleDocumentStore  # noqa: E402
+
+from greenprint import index_catalog  # noqa: E402
+from greenprint.ingest import compact, embed_chunks, ingest, read_chunks, write_index_files  # noqa: E402
+from greenprint.lexical import BM25Index  # noqa: E402
+from greenprint.retrieval import build_index  # noqa: E402
+from greenprint.vector_store import MmapVectorStore  # noqa: E402
+
+EMBED = MockEmbedding(embed_dim=8)
+SPLITTER = SentenceSplitter(chunk_size=64, chunk_overlap=0)  # with the file path in the metadata, one sentence per chunk
+
+KELP = "Kelp forests along rocky coasts absorb carbon dioxide from sea water and store part of it on the sea floor."
+BEEF = "Beef has the largest carbon footprint per kilogram of any common food, mostly from methane and cleared land."
+TRAIN = "Electric trains emit far less per passenger kilometre than domestic flights, even on a fossil heavy grid."
+
+
+def write(path, *paragraphs):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def index(tmp_path):
+    """An index built from one base document, as the vector_store converter does."""
+    persist_dir = tmp_path / "index"
+    persist_dir.mkdir()
+    chunks = read_chunks([write(tmp_path / "base" / "base.txt", "Water use depends on shower length.")], SPLITTER)
+    embed_chunks(chunks, EMBED)
+    docstore = SimpleDocumentStore()
+    docstore.add_documents(chunks)
+    manifest = write_index_files(persist_dir, chunks, np.array([chunk.embedding for chunk in chunks]), docstore)
+    index_catalog.create(persist_dir, chunks, None, manifest)
+    return persist_dir
+
+
+def live_texts(persist_dir):
+    snapshot = index_catalog.snapshot(persist_dir)
+    docstore = index_catalog.load_docstore(persist_dir, snapshot)
+    store = MmapVectorStore.load(persist_dir, snapshot=snapshot)
+    live = [node_id for node_id in store.ids if node_id is not None]
+    assert sorted(live) == sorted(docstore.docs)
+    return sorted(node.get_content() for node in docstore.get_nodes(live))
+
+
+def lexical_hits(persist_dir, query):
+    return [node_id for node_id, _ in BM25Index.load(persist_dir).search(query, 10)]
+
+
+def quiet(*paths, persist_dir):
+    return ingest(list(paths), persist_dir, EMBED, splitter=SPLITTER, progress=lambda message: None)
+
+
+def test_ingest_appends_new_chunks(tmp_path, index):
+    assert quiet(write(tmp_path / "docs" / "a.txt", KELP, BEEF), persist_dir=index) == 2
+    assert KELP in live_texts(index) and BEEF in live_texts(index)
+    assert len(lexical_hits(index, "kelp")) == 1
+    manifest = index_catalog.snapshot(index).manifest
+    assert manifest["docstore"] == "docstore.json" and len(manifest["bm25"]) == 2
+
+
+def test_stored_rows_are_unit_length_and_searched_in_place(tmp_path, index):
+    quiet(write(tmp_path / "docs" / "a.txt", KELP, BEEF), persist_dir=index)
+    store = MmapVectorStore.load(index)
+    assert store.normalized and isinstance(store.embeddings, np.memmap)
+    np.testing.assert_allclose(np.linalg.norm(store.embeddings, axis=1), 1.0, rtol=1e-6)
+    search = build_index(store.embeddings, normalized=store.normalized)
+    assert search.vectors is store.embeddings
+    _, scores = search.search(np.asarray(store.embeddings[1]) * 3.0, 1)
+    assert scores[0] == pytest.approx(1.0)
+
+
+def test_reingesting_an_unchanged_file_is_a_no_op(tmp_path, index):
+    doc = write(tmp_path / "docs" / "a.txt", KELP, BEEF)
+    quiet(doc, persist_dir=index)
+    version = index_catalog.version(index)
+    assert quiet(doc, persist_dir=index) == 0
+    assert index_catalog.version(index) == version
+
+
+def test_changed_file_replaces_its_chunks(tmp_path, index):
+    doc = write(tmp_path / "docs" / "a.txt", KELP, BEEF)
+    quiet(doc, persist_dir=index)
+    write(doc, KELP, TRAIN)
+    assert quiet(doc, persist_dir=index) == 1
+    texts = live_texts(index)
+    assert KELP in texts and TRAIN in texts and BEEF not in texts
+    assert lexical_hits(index, "beef") == []
+    assert len(index_catalog.snapshot(index).deleted_ids) == 1
+
+
+def test_shared_text_survives_while_another_file_references_it(tmp_path, index):
+    a = write(tmp_path / "docs" / "a.txt", KELP, BEEF)
+    b = write(tmp_path / "docs" / "b.txt", KELP)
+    quiet(a, persist_dir=index)
+    assert quiet(b, persist_dir=index) == 0  # same text: referenced, not embedded again
+    write(a, BEEF)
+    quiet(a, persist_dir=index)
+    assert KELP in live_texts(index)
+    write(b, TRAIN)
+    quiet(b, persist_dir=index)
+    texts = live_texts(index)
+    assert KELP not in texts and TRAIN in texts and BEEF in texts
+
+
+def test_same_file_name_in_different_directories(tmp_path, index):
+    first = write(tmp_path / "one" / "notes.txt", KELP)
+    second = write(tmp_path / "two" / "notes.txt", BEEF)
+    quiet(first, persist_dir=index)
+    quiet(second, persist_dir=index)
+    write(second, TRAIN)
+    quiet(second, persist_dir=index)
+    texts = live_texts(index)
+    assert KELP in texts and TRAIN in texts and BEEF not in texts
+
+
+def test_failed_ingestion_leaves_the_index_unchanged(tmp_path, index, monkeypatch):
+    before = live_texts(index)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("crashed before commit")
+
+    monkeypatch.setattr(index_catalog, "add_refs", fail)
+    with pytest.raises(RuntimeError):
+        quiet(write(tmp_path / "docs" / "a.txt", KELP, BEEF), persist_dir=index)
+    assert live_texts(index) == before
+    monkeypatch.undo()
+    assert quiet(tmp_path / "docs" / "a.txt", persist_dir=index) == 2
+    assert len(live_texts(index)) == len(before) + 2
+
+
+def test_compact_drops_deleted_chunks_and_keeps_references(tmp_path, index):
+    a = write(tmp_path / "docs" / "a.txt", KELP, BEEF)
+    b = write(tmp_path / "docs" / "b.txt", KELP)
+    quiet(a, b, persist_dir=index)
+    write(a, TRAIN)
+    quiet(a, persist_dir=index)
+    texts = live_texts(index)
+
+    assert compact(index, progress=lambda message: None) == len(texts)
+    snapshot = index_catalog.snapshot(index)
+    assert not snapshot.deleted_ids and None not in snapshot.node_ids
+    assert snapshot.manifest["generation"] == 1 and len(snapshot.manifest["bm25"]) == 1
+    assert live_texts(index) == texts
+    assert lexical_hits(index, "beef") == []
+
+    # References were carried over: b still owns the kelp chunk, a the train chunk
+    write(b, BEEF)
+    quiet(b, persist_dir=index)
+    texts = live_texts(index)
+    assert KELP not in texts and TRAIN in texts and BEEF in texts
+
+    compact(index, progress=lambda message: None)
+    assert not (index / "embeddings.npy").exists()  # generation 0 retired by the second compaction
+    assert live_texts(index) == texts
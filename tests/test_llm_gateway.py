@@ -0,0 +1,264 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from greenprint.llm_gateway import GatewayTimeout, HuggingFaceBackend, LLMGateway, LocalBackend, _is_transient
+
+
+def ask(text):
+    return [{"role": "user", "content": text}]
+
+
+class FlakyBackend:
+    """Fails the first ``failures`` calls with ``error``, then streams ``tokens``."""
+
+    def __init__(self, failures=0, error=ConnectionError, tokens=("a ", "b ", "c "), latency=0.0, token_delay=0.0,
+                 fail_after=None):
+        self.failures = failures
+        self.error = error
+        self.tokens = tokens
+        self.latency = latency
+        self.token_delay = token_delay
+        self.fail_after = fail_after
+        self.calls = 0
+        self.sent = 0
+
+    async def generate(self, messages, **params):
+        return "".join([token async for token in self.stream(messages, **params)])
+
+    async def stream(self, messages, **params):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.calls <= self.failures:
+            raise self.error("upstream failure")
+        for i, token in enumerate(self.tokens):
+            if i == self.fail_after:
+                raise ConnectionError("dropped mid-stream")
+            await asyncio.sleep(self.token_delay)
+            self.sent += 1
+            yield token
+
+
+def collect(gateway, messages, **kwargs):
+    async def run():
+        return [token async for token in gateway.stream(messages, **kwargs)]
+    return run()
+
+
+# --- Retries ---
+def test_transient_errors_are_retried():
+    backend = FlakyBackend(failures=2)
+    gateway = LLMGateway(backend, retries=2, backoff=0.001)
+    assert asyncio.run(gateway.generate(ask("q"))) == "a b c "
+    assert backend.calls == 3
+    assert gateway.stats["retries"] == 2
+
+
+def test_permanent_errors_are_not_retried():
+    backend = FlakyBackend(failures=1, error=ValueError)
+    gateway = LLMGateway(backend, retries=2, backoff=0.001)
+    with pytest.raises(ValueError):
+        asyncio.run(gateway.generate(ask("q")))
+    assert backend.calls == 1
+    assert gateway.stats["failures"] == 1
+
+
+def test_retries_give_up_after_the_limit():
+    backend = FlakyBackend(failures=5)
+    gateway = LLMGateway(backend, retries=2, backoff=0.001)
+    with pytest.raises(ConnectionError):
+        asyncio.run(gateway.generate(ask("q")))
+    assert backend.calls == 3
+
+
+def test_http_client_errors_are_transient():
+    httpx = pytest.importorskip("httpx")
+    requests = pytest.importorskip("requests")
+    assert _is_transient(httpx.ConnectTimeout("timed out"))
+    assert _is_transient(httpx.ConnectError("refused"))
+    assert _is_transient(requests.ConnectionError("refused"))
+    assert _is_transient(requests.ReadTimeout("timed out"))
+    assert not _is_transient(ValueError("bad request"))
+
+
+def test_server_errors_are_transient_by_status():
+    class Response:
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+    class HTTPError(Exception):
+        def __init__(self, status_code):
+            self.response = Response(status_code)
+
+    assert _is_transient(HTTPError(503))
+    assert _is_transient(HTTPError(429))
+    assert not _is_transient(HTTPError(400))
+
+
+def test_stream_retries_only_before_the_first_token():
+    backend = FlakyBackend(failures=1)
+    gateway = LLMGateway(backend, retries=2, backoff=0.001)
+    assert asyncio.run(collect(gateway, ask("q"))) == ["a ", "b ", "c "]
+    assert backend.calls == 2
+
+    backend = FlakyBackend(fail_after=1)
+    gateway = LLMGateway(backend, retries=2, backoff=0.001)
+    with pytest.raises(ConnectionError):
+        asyncio.run(collect(gateway, ask("q")))
+    assert backend.calls == 1
+
+
+# --- Deadlines ---
+def test_generate_deadline():
+    gateway = LLMGateway(FlakyBackend(latency=1.0), timeout=0.05)
+    with pytest.raises(GatewayTimeout):
+        asyncio.run(gateway.generate(ask("q")))
+    assert gateway.stats["timeouts"] == 1
+
+
+def test_deadline_covers_retries():
+    backend = FlakyBackend(failures=10, latency=0.02)
+    gateway = LLMGateway(backend, timeout=0.1, retries=10, backoff=0.05)
+    with pytest.raises(GatewayTimeout):
+        asyncio.run(gateway.generate(ask("q")))
+
+
+def test_stream_deadline():
+    gateway = LLMGateway(FlakyBackend(latency=1.0), timeout=0.05)
+    with pytest.raises(GatewayTimeout):
+        asyncio.run(collect(gateway, ask("q")))
+
+
+def test_a_caller_timing_out_does_not_cancel_the_shared_call():
+    async def run():
+        gateway = LLMGateway(FlakyBackend(latency=0.1))
+        impatient = asyncio.ensure_future(gateway.generate(ask("q"), timeout=0.01))
+        patient = asyncio.ensure_future(gateway.generate(ask("q"), timeout=1.0))
+        with pytest.raises(GatewayTimeout):
+            await impatient
+        return await patient
+    assert asyncio.run(run()) == "a b c "
+
+
+# --- Coalescing ---
+def test_identical_requests_share_one_call():
+    async def run():
+        backend = FlakyBackend(latency=0.05)
+        gateway = LLMGateway(backend)
+        results = await asyncio.gather(*(gateway.generate(ask("same")) for _ in range(5)),
+                                       gateway.generate(ask("other")))
+        return backend, gateway, results
+    backend, gateway, results = asyncio.run(run())
+    assert results == ["a b c "] * 6
+    assert backend.calls == 2
+    assert gateway.stats["coalesced"] == 4
+
+
+def test_different_parameters_are_not_coalesced():
+    async def run():
+        backend = FlakyBackend(latency=0.05)
+        gateway = LLMGateway(backend)
+        await asyncio.gather(gateway.generate(ask("q"), max_tokens=10), gateway.generate(ask("q"), max_tokens=20))
+        return backend
+    assert asyncio.run(run()).calls == 2
+
+
+def test_identical_streams_share_one_call():
+    async def run():
+        backend = FlakyBackend(latency=0.02, token_delay=0.02)
+        gateway = LLMGateway(backend)
+        first = asyncio.ensure_future(collect(gateway, ask("q")))
+        await asyncio.sleep(0.05)  # the second caller joins after the first token has arrived
+        second = await collect(gateway, ask("q"))
+        return backend, gateway, await first, second
+    backend, gateway, first, second = asyncio.run(run())
+    assert first == second == ["a ", "b ", "c "]
+    assert backend.calls == 1
+    assert gateway.stats["coalesced"] == 1
+
+
+def test_stream_is_cancelled_when_every_caller_leaves():
+    async def run():
+        gateway = LLMGateway(FlakyBackend(latency=1.0), timeout=0.05)
+        with pytest.raises(GatewayTimeout):
+            await collect(gateway, ask("q"))
+        await asyncio.sleep(0)
+        return gateway
+    gateway = asyncio.run(run())
+    assert not gateway._streams
+
+
+class BlockingClient:
+    """``InferenceClient`` stand-in whose stream blocks for ``delay`` seconds before each chunk."""
+
+    def __init__(self, chunks=100, delay=0.01):
+        self.chunks = chunks
+        self.delay = delay
+        self.read = 0
+        self.closed = threading.Event()
+
+    def chat_completion(self, messages, stream=False, **params):
+        try:
+            for i in range(self.chunks):
+                time.sleep(self.delay)
+                self.read += 1
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=f"{i} "))])
+        finally:
+            self.closed.set()
+
+
+def test_closing_a_huggingface_stream_stops_the_reader_thread():
+    backend = HuggingFaceBackend.__new__(HuggingFaceBackend)
+    backend.client = BlockingClient()
+    backend._executor = ThreadPoolExecutor(max_workers=1)
+
+    async def run():
+        tokens = backend.stream(ask("q"))
+        assert [await tokens.__anext__(), await tokens.__anext__()] == ["0 ", "1 "]
+        await tokens.aclose()
+    asyncio.run(run())
+    # aclose waits for the thread, which has closed the response by then
+    assert backend.client.closed.is_set()
+    read = backend.client.read
+    time.sleep(0.05)
+    assert backend.client.read == read < backend.client.chunks
+
+
+# --- Blocking entry points ---
+def test_blocking_entry_points():
+    gateway = LLMGateway(LocalBackend(latency=0.0, tokens_per_second=1e6))
+    messages = [{"role": "system", "content": "Be brief."}, {"role": "user", "content": "How much CO2?"},
+                {"role": "assistant", "content": "Some."}, {"role": "user", "content": "Per year?"}]
+    assert gateway.complete(messages) == "(local stand-in) You asked: Per year? "
+    assert "".join(gateway.stream_complete(messages)) == "(local stand-in) You asked: Per year? "
+
+
+def test_closing_a_blocking_stream_early_cancels_it():
+    backend = FlakyBackend(tokens=[f"{i} " for i in range(100)], token_delay=0.01)
+    gateway = LLMGateway(backend)
+    tokens = gateway.stream_complete(ask("q"))
+    assert [next(tokens), next(tokens)] == ["0 ", "1 "]
+    tokens.close()
+    time.sleep(0.05)
+    assert not gateway._streams
+    sent = backend.sent
+    time.sleep(0.05)
+    assert backend.sent == sent < len(backend.tokens)
+
+
+def test_chat_messages_fit_the_mistral_template():
+    pytest.importorskip("llama_index.core")
+    from llama_index.core.base.llms.types import ChatMessage, MessageRole
+
+    from greenprint.gateway_llm import to_gateway_messages
+
+    messages = [ChatMessage(role=MessageRole.SYSTEM, content="Context."),
+                ChatMessage(role=MessageRole.SYSTEM, content="Be brief."),
+                ChatMessage(role=MessageRole.USER, content="Hi"),
+                ChatMessage(role=MessageRole.USER, content="How much CO2?")]
+    assert to_gateway_messages(messages) == [{"role": "system", "content": "Context.\n\nBe brief."},
+                                             {"role": "user", "content": "Hi\n\nHow much CO2?"}]
@@ -0,0 +1,28 @@
+import numpy as np
+
+from greenprint.activities import ACTIVITIES
+from greenprint.datasets import load_datasets
+from greenprint.totals import FootprintTotals
+
+
+def germany_totals():
+    factors = load_datasets().factors
+    return FootprintTotals(factors.aligned(ACTIVITIES)[:, factors.country_index["Germany"]], "Germany")
+
+
+def test_total_follows_each_input():
+    totals = germany_totals()
+    totals.set_quantity("Beef", 2.0)
+    totals.set_quantity("Electricity", 150.0)
+    assert np.isclose(totals.total, totals.contributions.sum())
+    assert totals.total > 0
+
+
+def test_total_returns_to_exactly_zero():
+    totals = germany_totals()
+    for activity, quantity in (("Beef", 0.1), ("Petrol_car", 0.7), ("Electricity", 0.3)):
+        totals.set_quantity(activity, quantity)
+    for activity in ("Beef", "Petrol_car", "Electricity"):
+        totals.set_quantity(activity, 0)
+    assert totals.total == 0.0
+    assert totals.emissions() == {}